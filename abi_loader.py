@@ -0,0 +1,45 @@
+import os, json
+from functools import lru_cache
+
+path = os.path.dirname(os.path.abspath(__file__))
+
+# ABI entries the bots actually call, contracts are built from these trimmed ABIs
+# an ABI missing from here is loaded whole
+ABI_ENTRIES = {
+    "multicall_abi": ("aggregate", "tryBlockAndAggregate", "getCurrentBlockTimestamp"),
+    "erc20_abi": ("balanceOf", "approve", "allowance", "decimals"),
+    "ethweekly_abi": (
+        "calculatePremium",
+        "calculatePurchaseFees",
+        "currentEpoch",
+        "getCollateralPrice",
+        "getEpochData",
+        "getUnderlyingPrice",
+        "getVolatility",
+        "purchase",
+    ),
+    "lyraquoter_abi": ("quote",),
+    "greek_cache_abi": ("getMinCollateral",),
+    "optionmarket_abi": ("getLiveBoards", "getOptionBoard", "getStrikeAndExpiry", "openPosition"),
+    "price_feed_abi": ("latestRoundData", "decimals"),
+    "gas_price_oracle_abi": ("gasPrice", "l1BaseFee", "overhead", "scalar", "decimals"),
+}
+
+
+@lru_cache(maxsize=None)
+def load_abi(name):
+    """
+    abis/<name>.json trimmed to ABI_ENTRIES[name], parsed on first use only
+    """
+    with open(os.path.join(path, f"abis/{name}.json"), "r") as jsonFile:
+        abi = json.load(jsonFile)
+    entries = ABI_ENTRIES.get(name)
+    if entries is None:
+        return abi
+    return [entry for entry in abi if entry.get("type") == "function" and entry.get("name") in entries]
+
+
+@lru_cache(maxsize=None)
+def load_contract_addresses():
+    with open(os.path.join(path, "constants/contract_addresses.json"), "r") as jsonFile:
+        return json.load(jsonFile)
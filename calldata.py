@@ -0,0 +1,107 @@
+import threading
+from functools import lru_cache
+from web3 import Web3
+
+_templates = {}  # signature -> Calldata_Template
+_functions = {}  # (contract address, function name) -> Calldata_Template
+_lock = threading.Lock()
+
+
+def _pack_uint(value):
+    return int(value).to_bytes(32, "big")
+
+
+def _pack_int(value):
+    return int(value).to_bytes(32, "big", signed=True)
+
+
+@lru_cache(maxsize=256)
+def _pack_address(value):
+    address = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    if len(address) != 20:
+        raise ValueError(f"{value!r} is not a 20 bytes address")
+    return bytes(12) + address
+
+
+def _pack_bool(value):
+    return (1 if value else 0).to_bytes(32, "big")
+
+
+def _pack_fixed_bytes(value):
+    return bytes(value).ljust(32, b"\0")
+
+
+def _get_packer(abi_type):
+    if abi_type.startswith("uint"):
+        return _pack_uint
+    if abi_type.startswith("int"):
+        return _pack_int
+    if abi_type == "address":
+        return _pack_address
+    if abi_type == "bool":
+        return _pack_bool
+    if abi_type.startswith("bytes") and abi_type != "bytes" and "[" not in abi_type:
+        return _pack_fixed_bytes
+    raise Exception(f"{abi_type} is not a static ABI type, encode it with contract.functions")
+
+
+class Calldata_Template:
+    """
+    4-byte selector and static layout of one contract function
+
+    Arguments are packed straight into a buffer reused across calls, the output is the
+    same hex string as `contract.functions.X(...)._encode_transaction_data()`.
+    """
+
+    def __init__(self, signature, types):
+        self.signature = signature
+        self.types = types
+        self.selector = bytes(Web3.keccak(text=signature)[:4])
+        self._packers = [_get_packer(abi_type) for abi_type in types]
+        self._buffer = bytearray(4 + 32 * len(types))
+        self._buffer[:4] = self.selector
+        self._lock = threading.Lock()
+
+    def encode(self, *args):
+        if len(args) != len(self._packers):
+            raise Exception(f"{self.signature} takes {len(self._packers)} arguments, {len(args)} given")
+        with self._lock:
+            buffer = self._buffer
+            offset = 4
+            for pack, arg in zip(self._packers, args):
+                word = pack(arg)
+                # a wrong sized slice assignment would resize the shared buffer
+                if len(word) != 32:
+                    raise ValueError(f"{arg!r} does not fit in one word of {self.signature}")
+                buffer[offset : offset + 32] = word
+                offset += 32
+            return "0x" + buffer.hex()
+
+    def encode_many(self, rows):
+        """
+        rows: iterable of argument tuples, output: list of calldatas
+        """
+        return [self.encode(*row) for row in rows]
+
+
+def get_template(contract, fn_name):
+    """
+    Calldata_Template of contract.fn_name, built once per function signature
+    """
+    key = (contract.address, fn_name)
+    template = _functions.get(key)
+    if template is not None:
+        return template
+
+    entries = [entry for entry in contract.abi if entry.get("type") == "function" and entry.get("name") == fn_name]
+    if len(entries) != 1:
+        raise Exception(f"{fn_name} is missing or overloaded in the ABI of {contract.address}")
+    types = tuple(arg["type"] for arg in entries[0]["inputs"])
+    signature = f"{fn_name}({','.join(types)})"
+    with _lock:
+        template = _templates.get(signature)
+        if template is None:
+            template = Calldata_Template(signature, types)
+            _templates[signature] = template
+        _functions[key] = template
+    return template
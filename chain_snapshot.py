@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CALL_GAS = 100_000  # calls without a "gas" estimate
+MAX_CHUNK_GAS = 20_000_000  # stays below the eth_call gas cap of public nodes
+
+
+class Chain_Snapshot:
+    """
+    Multicall access pinned to one block per scan
+
+    While pinned every aggregate runs at the same block and each (block, target, calldata)
+    is fetched at most once, so all quotes of a scan are consistent and repeated calls are free.
+    Unpinned, calls go to the latest block without memoization.
+
+    Call lists are split into chunks of at most `max_chunk_gas` estimated gas (a call dict may
+    carry its own "gas" estimate) sent concurrently with `tryBlockAndAggregate`, so one
+    reverting call only voids its own entry and big scans stay under node limits.
+    """
+
+    def __init__(self, w3, multicall, max_chunk_gas=MAX_CHUNK_GAS, max_workers=4):
+        self.w3 = w3
+        self.multicall = multicall
+        self.max_chunk_gas = max_chunk_gas
+        self.block_number = None
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def block_identifier(self):
+        return "latest" if self.block_number is None else self.block_number
+
+    def pin(self, block_number=None):
+        """
+        Pin to block_number (latest block by default) and drop results of older blocks
+        """
+        if block_number is None:
+            block_number = self.w3.eth.block_number
+        with self._lock:
+            self.block_number = block_number
+            self._cache = {key: value for key, value in self._cache.items() if key[0] == block_number}
+        return block_number
+
+    def unpin(self):
+        with self._lock:
+            self.block_number = None
+            self._cache = {}
+
+    def aggregate(self, calls):
+        """
+        Same output as multicall `aggregate`: [block_number, return_data]
+        NOTE: return_data is None for calls that reverted (or could not be sent) instead of raising
+        """
+        block_number = self.block_number
+        if block_number is None:
+            return self.try_aggregate(calls)
+
+        keys = [(block_number, call["target"], self._normalize(call["callData"])) for call in calls]
+        with self._lock:
+            missing = list({key: call for key, call in zip(keys, calls) if key not in self._cache}.items())
+        if missing:
+            missing_calls = [call for _, call in missing]
+            _, rets = self._try_aggregate(missing_calls, block_number)
+            with self._lock:
+                for (key, _), ret in zip(missing, rets):
+                    # reverts are final at a pinned block, failed requests are retried next time
+                    if ret is not False:
+                        self._cache[key] = ret
+        with self._lock:
+            return [block_number, [self._cache.get(key) for key in keys]]
+
+    def try_aggregate(self, calls, block_identifier=None):
+        """
+        Chunked, concurrent tryBlockAndAggregate of calls at one block
+        Output: [block_number, return_data], None for calls that reverted or could not be sent
+        """
+        block_number, rets = self._try_aggregate(calls, block_identifier)
+        return [block_number, [None if ret is False else ret for ret in rets]]
+
+    def _try_aggregate(self, calls, block_identifier=None):
+        """
+        Same as try_aggregate with False (instead of None) for calls whose request failed
+        """
+        chunks = self.get_chunks(calls)
+        if block_identifier is None:
+            if len(chunks) <= 1:
+                block_identifier = "latest"
+            else:
+                # every chunk reads the same block
+                block_identifier = self.w3.eth.block_number
+        if not chunks:
+            return [block_identifier, []]
+
+        futures = [self._executor.submit(self._send_chunk, chunk, block_identifier) for chunk in chunks]
+        block_number, rets = block_identifier, []
+        for future in futures:
+            chunk_block, chunk_rets = future.result()
+            if chunk_block is not None:
+                block_number = chunk_block
+            rets += chunk_rets
+        return [block_number, rets]
+
+    def get_chunks(self, calls):
+        chunks, chunk, chunk_gas = [], [], 0
+        for call in calls:
+            gas = call.get("gas", DEFAULT_CALL_GAS)
+            if chunk and chunk_gas + gas > self.max_chunk_gas:
+                chunks.append(chunk)
+                chunk, chunk_gas = [], 0
+            chunk.append({"target": call["target"], "callData": call["callData"]})
+            chunk_gas += gas
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _send_chunk(self, chunk, block_identifier):
+        """
+        Output: (block number, return data of the chunk), halves the chunk when the node rejects it
+        """
+        try:
+            block_number, _, results = self.multicall.functions.tryBlockAndAggregate(False, chunk).call(
+                block_identifier=block_identifier
+            )
+        except Exception as e:
+            if len(chunk) == 1:
+                print(f"Multicall to {chunk[0]['target']} failed: {e}")
+                return None, [False]
+            half = len(chunk) // 2
+            first_block, first = self._send_chunk(chunk[:half], block_identifier)
+            second_block, second = self._send_chunk(chunk[half:], block_identifier)
+            return first_block or second_block, first + second
+        return block_number, [ret if success else None for success, ret in results]
+
+    @staticmethod
+    def _normalize(calldata):
+        if isinstance(calldata, (bytes, bytearray)):
+            return "0x" + bytes(calldata).hex()
+        return calldata.lower()
@@ -0,0 +1,135 @@
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from calldata import get_template
+from decoding import decode_uint256
+
+CALL_OPTION_TYPES = (0, 2, 3)  # long call, short call base/quote collateralized
+MIN_COLLATERAL_CALL_GAS = 300_000
+
+
+class Collateral_Cache:
+    """
+    LRU cache of greek_cache `getMinCollateral` keyed by (option_type, strike, expiry, spot bucket, amount)
+
+    The shocked spot is rounded to a `spot_tick` grid on the conservative side (up for calls,
+    down for puts) and that bucket price is what gets quoted, so every key maps to an exact
+    on-chain value. Misses are read in one multicall; `prefetch` fills the neighbouring bucket
+    for a whole grid of strikes and sizes in the background while spot is within
+    `prefetch_margin` ticks of a bucket edge, so crossing it is a cache hit.
+    """
+
+    def __init__(self, greek_cache, snapshot, spot_tick=10, maxsize=4096, prefetch_margin=0.2):
+        self.greek_cache = greek_cache
+        self.snapshot = snapshot
+        self.spot_tick = spot_tick
+        self.maxsize = maxsize
+        self.prefetch_margin = prefetch_margin
+
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetched = {}  # option_type -> last prefetched spot bucket
+        self.hits = 0
+        self.misses = 0
+
+    def get_ticks(self, option_type, spot_price):
+        """
+        Bucket of spot_price in ticks, rounded up for calls and down for puts
+        """
+        ticks = spot_price / self.spot_tick
+        return math.ceil(ticks) if option_type in CALL_OPTION_TYPES else math.floor(ticks)
+
+    def bucket(self, option_type, spot_price):
+        """
+        Spot price rounded to the tick grid, up for calls and down for puts
+        """
+        return self.get_ticks(option_type, spot_price) * self.spot_tick
+
+    def get(self, option_type, strike, expiry, spot_price, amount):
+        return self.get_many([(option_type, strike, expiry, spot_price, amount)])[0]
+
+    def get_many(self, requests):
+        """
+        requests: iterable of (option_type, strike, expiry, spot_price, amount), prices and amounts in units
+        Output: list of min collaterals in units (nan where the call reverted)
+        """
+        keys = [
+            (option_type, strike, expiry, self.bucket(option_type, spot_price), amount)
+            for option_type, strike, expiry, spot_price, amount in requests
+        ]
+        return self._get_keys(keys)
+
+    def prefetch(self, option_type, spot_price, strikes_and_expiries, amounts):
+        """
+        Fill the bucket next to spot_price for every (strike, expiry) x amount in the background
+        when spot_price is within prefetch_margin ticks of the edge between them
+        Output: future of the fetch, None when spot is not near an edge or that bucket was prefetched
+        """
+        ticks = self.get_ticks(option_type, spot_price)
+        # bucket `ticks` covers (ticks - 1, ticks] ticks for calls, [ticks, ticks + 1) for puts
+        lower = ticks - 1 if option_type in CALL_OPTION_TYPES else ticks
+        position = spot_price / self.spot_tick - lower
+        if position >= 1 - self.prefetch_margin:
+            ticks += 1
+        elif position <= self.prefetch_margin:
+            ticks -= 1
+        else:
+            return None
+        spot_bucket = ticks * self.spot_tick
+        if self._prefetched.get(option_type) == spot_bucket:
+            return None
+        self._prefetched[option_type] = spot_bucket
+        keys = [
+            (option_type, strike, expiry, spot_bucket, amount)
+            for strike, expiry in strikes_and_expiries
+            for amount in amounts
+        ]
+        return self._executor.submit(self._get_keys, keys)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._prefetched = {}
+
+    def _get_keys(self, keys):
+        # hits are copied out before the misses are fetched, storing the misses may evict them
+        values = {}
+        with self._lock:
+            for key in keys:
+                value = self._values.get(key)
+                if value is not None:
+                    self._values.move_to_end(key)
+                    values[key] = value
+            missing = [key for key in dict.fromkeys(keys) if key not in values]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            values.update(zip(missing, self._fetch(missing)))
+        return [values[key] for key in keys]
+
+    def _fetch(self, keys):
+        values = self._read(keys)
+        with self._lock:
+            for key, value in zip(keys, values):
+                if value == value:  # reverted calls (nan) are not cached
+                    self._values[key] = value
+                    self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+        return values
+
+    def _read(self, keys):
+        get_min_collateral = get_template(self.greek_cache, "getMinCollateral")
+        calls = [
+            {
+                "target": self.greek_cache.address,
+                "callData": get_min_collateral.encode(
+                    option_type, int(strike * 1e18), expiry, int(spot_bucket * 1e18), int(amount * 1e18)
+                ),
+                "gas": MIN_COLLATERAL_CALL_GAS,
+            }
+            for option_type, strike, expiry, spot_bucket, amount in keys
+        ]
+        return decode_uint256(self.snapshot.aggregate(calls)[1], scale=1e18).tolist()
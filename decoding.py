@@ -0,0 +1,57 @@
+import numpy as np
+
+WORD = 32
+LIMB_WEIGHTS = np.array([2.0**192, 2.0**128, 2.0**64, 1.0])
+
+
+def get_words(return_data, word=0):
+    """
+    Output: (len(return_data), 32) uint8 array of the `word`-th 32-byte word of every entry
+            and the mask of entries that hold it (failed calls come back as None or short)
+    """
+    start, end = word * WORD, (word + 1) * WORD
+    valid = np.array([ret is not None and len(ret) >= end for ret in return_data], dtype=bool)
+    buffer = b"".join(ret[start:end] if ok else bytes(WORD) for ret, ok in zip(return_data, valid))
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(-1, WORD), valid
+
+
+def decode_uint256(return_data, word=0, scale=1):
+    """
+    `word`-th uint256 of every entry of a multicall returnData list divided by scale
+    Output: float64 array, nan where the call failed
+    """
+    if len(return_data) == 0:
+        return np.array([], dtype=float)
+    words, valid = get_words(return_data, word)
+    limbs = words.view(">u8").astype(float)
+    values = limbs @ LIMB_WEIGHTS / scale
+    values[~valid] = np.nan
+    return values
+
+
+def decode_int256(return_data, word=0, scale=1):
+    """
+    Same as decode_uint256 for two's complement int256 words (e.g. Chainlink answers)
+    """
+    if len(return_data) == 0:
+        return np.array([], dtype=float)
+    words, valid = get_words(return_data, word)
+    limbs = words.view(">u8")
+    negative = words[:, 0] >= 0x80
+    # -x = ~x + 1, applied on the limbs so large magnitudes keep full float precision
+    magnitudes = np.where(negative[:, None], ~limbs, limbs).astype(float) @ LIMB_WEIGHTS
+    values = np.where(negative, -(magnitudes + 1), magnitudes) / scale
+    values[~valid] = np.nan
+    return values
+
+
+def decode_ints(return_data, word=0):
+    """
+    Exact `word`-th uint256 of every entry as Python ints (ids, timestamps, raw fee parameters)
+    Output: list, None where the call failed
+    """
+    start, end = word * WORD, (word + 1) * WORD
+    return [
+        int.from_bytes(ret[start:end], "big") if ret is not None and len(ret) >= end else None
+        for ret in return_data
+    ]
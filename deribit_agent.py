@@ -1,10 +1,11 @@
 import asyncio
-import websockets
 import aiohttp
-import json
 import os
 import numpy as np
+from collections import namedtuple
 from dotenv import load_dotenv
+from deribit_session import Deribit_Session
+from deribit_book import Book_Engine
 
 load_dotenv()
 
@@ -14,6 +15,18 @@ config = {
 }
 
 
+class Deribit_Result(namedtuple("Deribit_Result", ["result", "error"])):
+    """
+    Outcome of one request of a fan-out, exactly one of result/error is set
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
 class Deribit_Agent:
     def __init__(self, config):
         is_test = config.get("is_test")
@@ -26,41 +39,59 @@ class Deribit_Agent:
             self.client_secret = os.getenv("DERIBIT_CLIENT_SECRET")
             self.url = "wss://www.deribit.com/ws/api/v2"
 
-        self.auth_creds = self._get_auth_creds()
-
         self.index = config.get("index")  # eth_usd
         self.currency = self.index.split("-")[0].upper()
         self.orderbook_depth = config.get("orderbook_depth", 100)
         self.exchange_fee = config.get("exchange_fee", 0.0003)
         self.settlement_fee = config.get("settlement_fee", 0.00015)
 
-    @staticmethod
-    def async_loop(api, message):
-        return asyncio.get_event_loop().run_until_complete(api(message))
+        # one long-lived connection shared by every call, connects lazily on first use
+        self.session = Deribit_Session(
+            self.url,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            heartbeat_interval=config.get("heartbeat_interval", 10),
+            request_timeout=config.get("request_timeout", 10),
+            limits_currency=config.get("spot", "ETH"),
+        )
+        # local L2 books streamed over the session, see `subscribe_orderbooks`
+        self.books = Book_Engine(self.session, interval=config.get("book_interval", "100ms"))
+
+    def run(self, coro):
+        """
+        Blocking run of coro on the session loop, callable from any thread (e.g. engine workers)
+        """
+        self.session.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.session.loop).result()
 
-    async def public_api(self, msg):
+    async def fan_out(self, method, params_by_key, private=False):
         """
-        Calls Deribit public API with msg
+        Send one request per key concurrently over the session
+        Output: {key: Deribit_Result}, independent of any other batch in flight
         """
-        async with websockets.connect(self.url) as websocket:
-            await websocket.send(msg)
-            while websocket.open:
-                response = await websocket.recv()
-                return json.loads(response)
+        keys = list(params_by_key)
+        responses = await asyncio.gather(
+            *[self.session.acall(method, params_by_key[key], private) for key in keys], return_exceptions=True
+        )
+        results = {}
+        for key, response in zip(keys, responses):
+            if isinstance(response, Exception):
+                results[key] = Deribit_Result(None, {"message": str(response)})
+            else:
+                results[key] = Deribit_Result(response.get("result"), response.get("error"))
+        return results
 
-    async def private_api(self, msg):
+    def public_call(self, method, params):
+        """
+        Blocking public call through the shared session
         """
-        Calls Deribit private API with msg, used for trading
+        return self.session.call(method, params)
 
+    def private_call(self, method, params):
         """
-        async with websockets.connect(self.url) as websocket:
-            await websocket.send(self.auth_creds)
-            while websocket.open:
-                response = await websocket.recv()
-                await websocket.send(msg)
-                response = await websocket.recv()
-                break
-            return json.loads(response)
+        Blocking private call through the authenticated session (logs in once, token is cached)
+        """
+        return self.session.call(method, params, private=True)
 
     ##############################
     #####   Trading section   ####
@@ -83,8 +114,7 @@ class Deribit_Agent:
             "amount": amount,
             "type": "market",
         }
-        msg = self._get_msg(method, params)
-        response = self.async_loop(self.private_api, msg)
+        response = self.private_call(method, params)
 
         return response
 
@@ -109,8 +139,7 @@ class Deribit_Agent:
             "post_only": post_only,
             "reduce_only": reduce_only,
         }
-        msg = self._get_msg(method, params)
-        response = self.async_loop(self.private_api, msg)
+        response = self.private_call(method, params)
         return response
 
     ##############################
@@ -123,8 +152,7 @@ class Deribit_Agent:
         """
         method = "public/get_index_price"
         params = {"index_name": self.index}
-        msg = self._get_msg(method, params)
-        response = self.async_loop(self.public_api, msg)
+        response = self.public_call(method, params)
         index_price = response["result"]["index_price"]
         return index_price
 
@@ -134,8 +162,7 @@ class Deribit_Agent:
         """
         method = "public/get_book_summary_by_instrument"
         params = {"instrument_name": instrument_name}
-        msg = self._get_msg(method, params)
-        response = self.async_loop(self.public_api, msg)
+        response = self.public_call(method, params)
         mid_price_eth = response["result"][0]["mid_price"]
         index_price = 1  # self.get_index_price()
         mid_price = mid_price_eth * index_price
@@ -146,8 +173,26 @@ class Deribit_Agent:
         Quote: Prices of Buying/Selling `amount` contract of option with direction = long/short in USD
         """
         orderbook = self.get_orderbook(instrument_name)
+        return self._get_pure_quotes(orderbook, amounts, direction)
+
+    async def get_batch_orderbooks(self, instrument_names):
+        """
+        Output: {instrument_name: orderbook}, from the local books or one concurrent fan-out for the missing ones
+        NOTE: a book that cannot be read comes back empty, its quotes are nan and the scan skips it
+        """
+        orderbooks = {name: self.books.get(name, self.orderbook_depth) for name in instrument_names}
+        missing = [name for name, orderbook in orderbooks.items() if orderbook is None]
+        if missing:
+            for name, response in (await self.get_orderbooks(missing, self.orderbook_depth)).items():
+                if not response.ok:
+                    print(f"Failed to get {name} orderbook: {response.error}")
+                    orderbooks[name] = {"bids": [], "asks": []}
+                    continue
+                orderbooks[name] = response.result
+        return orderbooks
+
+    def _get_pure_quotes(self, orderbook, amounts, direction):
         index_price = 1  # self.get_index_price()
-        quotes = []
         if direction == "long":
             side = "asks"
         elif direction == "short":
@@ -155,20 +200,54 @@ class Deribit_Agent:
         else:
             raise ValueError("direction must be long or short")
 
-        for amount in amounts:
-            price_and_fees = self._get_avg_price_and_fees(orderbook[side], amount)
-            quote = self._get_pure_quote(price_and_fees, amount, index_price, direction)
-            quotes.append(quote)
-        return quotes
+        amounts = np.asarray(amounts, dtype=float)
+        prices_and_fees = self._get_avg_prices_and_fees(orderbook[side], amounts)
+        quotes = self._get_pure_quote(prices_and_fees, amounts, index_price, direction)
+        return quotes.tolist()
+
+    async def get_listed_options(self, currency):
+        """
+        Output: {instrument_name: {"instrument": get_instruments entry, "summary": book summary}}
+                for every live option of currency, from two concurrent bulk calls
+        """
+        instruments, summaries = await asyncio.gather(
+            self.session.acall("public/get_instruments", {"currency": currency, "kind": "option", "expired": False}),
+            self.session.acall("public/get_book_summary_by_currency", {"currency": currency, "kind": "option"}),
+        )
+        summaries = {summary["instrument_name"]: summary for summary in summaries["result"]}
+        return {
+            instrument["instrument_name"]: {
+                "instrument": instrument,
+                "summary": summaries.get(instrument["instrument_name"], {}),
+            }
+            for instrument in instruments["result"]
+        }
+
+    def subscribe_orderbooks(self, instrument_names):
+        """
+        Stream the books of instrument_names into local state, books of other instruments are dropped
+        """
+        self.books.track(instrument_names)
+
+    async def get_orderbooks(self, instrument_names, depth=5):
+        """
+        Output: {instrument_name: Deribit_Result} of `public/get_order_book` for every instrument
+        """
+        method = "public/get_order_book"
+        params = {name: {"instrument_name": name, "depth": depth} for name in instrument_names}
+        return await self.fan_out(method, params)
 
     def get_orderbook(self, instrument_name):
         """
         Output: orderbook of class instrument
+        NOTE: read from the local streamed book when subscribed and in sync, polled otherwise
         """
+        orderbook = self.books.get(instrument_name, self.orderbook_depth)
+        if orderbook is not None:
+            return orderbook
         method = "public/get_order_book"
         params = {"instrument_name": instrument_name, "depth": self.orderbook_depth}
-        msg = self._get_msg(method, params)
-        response = self.async_loop(self.public_api, msg)
+        response = self.public_call(method, params)
         result = response["result"]
         return {"bids": result["bids"], "asks": result["asks"]}
 
@@ -213,42 +292,49 @@ class Deribit_Agent:
         """
         Output: avg buy/sell price of option in ETH and trading + settlement fee in ETH
         """
+        prices_and_fees = self._get_avg_prices_and_fees(orderbook_side, [amount])
+        return {key: float(value[0]) for key, value in prices_and_fees.items()}
+
+    def _get_avg_prices_and_fees(self, orderbook_side, amounts):
+        """
+        Output: avg buy/sell prices of option in ETH and trading + settlement fees in ETH, one per amount
+        NOTE: the book side is walked once, every amount is located with a single searchsorted
+              amounts deeper than the book get price nan and zero fees
+        """
+        amounts = np.asarray(amounts, dtype=float)
         if len(orderbook_side) == 0:
             return {
-                "price": np.nan,
-                "trading_fee": 0,
-                "settlement_fee": 0,
+                "price": np.full(amounts.shape, np.nan),
+                "trading_fee": np.zeros(amounts.shape),
+                "settlement_fee": np.zeros(amounts.shape),
             }
-        seen_amount = 0
-        total_paid = 0
-        total_trading_fee = 0
-        total_settlement_fee = 0
-        for level in orderbook_side:
-            price = level[0]
-            size = level[1]
-            trading_fee = self.get_trading_fee(price)
-            settlement_fee = self.get_settlement_fee(price)
-            if size + seen_amount >= amount:
-                size_diff = amount - seen_amount
-                seen_amount = amount
-                total_paid += price * size_diff
-                total_trading_fee += trading_fee * size_diff
-                total_settlement_fee += settlement_fee * size_diff
-                return {
-                    "price": total_paid / amount,
-                    "trading_fee": total_trading_fee / amount,
-                    "settlement_fee": total_settlement_fee / amount,
-                }
-            else:
-                seen_amount += size
-                total_paid += size * price
-                total_trading_fee += size * trading_fee
-                total_settlement_fee += size * settlement_fee
+        levels = np.asarray(orderbook_side, dtype=float)
+        prices = levels[:, 0]
+        sizes = levels[:, 1]
+        trading_fees = np.minimum(self.exchange_fee, prices * 0.125)
+        settlement_fees = np.minimum(self.settlement_fee, prices * 0.125)
+
+        # cumulative sums with a leading 0, entry i covers the levels before level i
+        cum_sizes = np.concatenate(([0.0], np.cumsum(sizes)))
+        cum_paid = np.concatenate(([0.0], np.cumsum(prices * sizes)))
+        cum_trading_fee = np.concatenate(([0.0], np.cumsum(trading_fees * sizes)))
+        cum_settlement_fee = np.concatenate(([0.0], np.cumsum(settlement_fees * sizes)))
+
+        # level where each amount gets filled, == n_levels when the book is too thin
+        level = np.searchsorted(cum_sizes[1:], amounts, side="left")
+        filled = level < len(prices)
+        level = np.minimum(level, len(prices) - 1)
+        size_diff = amounts - cum_sizes[level]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = (cum_paid[level] + prices[level] * size_diff) / amounts
+            trading_fee = (cum_trading_fee[level] + trading_fees[level] * size_diff) / amounts
+            settlement_fee = (cum_settlement_fee[level] + settlement_fees[level] * size_diff) / amounts
 
         return {
-            "price": np.nan,
-            "trading_fee": 0,
-            "settlement_fee": 0,
+            "price": np.where(filled, price, np.nan),
+            "trading_fee": np.where(filled, trading_fee, 0.0),
+            "settlement_fee": np.where(filled, settlement_fee, 0.0),
         }
 
     ##############################
@@ -257,34 +343,15 @@ class Deribit_Agent:
     def get_account_summary(self, currency, extended=True):
         method = "private/get_account_summary"
         params = {"currency": currency, "extended": extended}
-        msg = self._get_msg(method, params)
-        summary = self.async_loop(self.private_api, msg)
+        summary = self.private_call(method, params)
         return summary
 
     def get_position(self, instrument):
         method = "private/get_position"
         params = {"instrument_name": instrument}
-        msg = self._get_msg(method, params)
-        positions = self.async_loop(self.private_api, msg)
+        positions = self.private_call(method, params)
         return positions
 
-    @staticmethod
-    def _get_msg(method, params, id=0):
-        """
-        Helper: msg to call API with
-        """
-        msg = {"jsonrpc": "2.0", "method": method, "id": int(id), "params": params}
-        return json.dumps(msg)
-
-    def _get_auth_creds(self):
-        method = "public/auth"
-        params = {
-            "grant_type": "client_credentials",
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-        }
-        return self._get_msg(method, params)
-
 
 config = {
     "is_test": False,
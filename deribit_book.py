@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+
+class Local_Order_Book:
+    """
+    In-memory L2 book for one instrument, maintained from `book.{instrument}.{interval}` notifications
+    """
+
+    def __init__(self, instrument_name):
+        self.instrument_name = instrument_name
+        self.bids = {}
+        self.asks = {}
+        self.change_id = None
+        self.timestamp = None
+        self.synced = False
+        self._lock = threading.Lock()
+
+    def apply(self, data):
+        """
+        Apply a snapshot or a change notification
+        Output: False when a change does not follow the last change_id (book needs a new snapshot)
+        """
+        with self._lock:
+            if data["type"] == "snapshot":
+                self.bids = {price: amount for _, price, amount in data["bids"]}
+                self.asks = {price: amount for _, price, amount in data["asks"]}
+            else:
+                if not self.synced or data.get("prev_change_id") != self.change_id:
+                    self.synced = False
+                    return False
+                self._apply_levels(self.bids, data["bids"])
+                self._apply_levels(self.asks, data["asks"])
+            self.change_id = data["change_id"]
+            self.timestamp = data["timestamp"]
+            self.synced = True
+            return True
+
+    def reset(self):
+        with self._lock:
+            self.synced = False
+
+    def levels(self, depth=None):
+        """
+        Output: {"bids": [[price, amount], ...], "asks": [[price, amount], ...]} best levels first,
+                same shape as `public/get_order_book`
+        """
+        with self._lock:
+            bids = sorted(self.bids.items(), reverse=True)
+            asks = sorted(self.asks.items())
+        return {
+            "bids": [[price, amount] for price, amount in bids[:depth]],
+            "asks": [[price, amount] for price, amount in asks[:depth]],
+        }
+
+    @staticmethod
+    def _apply_levels(side, changes):
+        for action, price, amount in changes:
+            if action == "delete":
+                side.pop(price, None)
+            else:
+                side[price] = amount
+
+
+class Book_Engine:
+    """
+    Keeps a Local_Order_Book per tracked instrument up to date over a Deribit_Session
+    """
+
+    def __init__(self, session, interval="100ms"):
+        self.session = session
+        self.interval = interval
+        self.books = {}
+        self.listeners = []
+        self._resyncing = set()
+        self.session.add_disconnect_callback(self._on_disconnect)
+
+    def track(self, instrument_names):
+        """
+        Subscribe to the books of instrument_names and drop the ones no longer needed
+        """
+        instrument_names = set(instrument_names)
+        removed = [name for name in self.books if name not in instrument_names]
+        added = [name for name in instrument_names if name not in self.books]
+        if removed:
+            self.session.unsubscribe([self.channel(name) for name in removed])
+            for name in removed:
+                del self.books[name]
+        if added:
+            for name in added:
+                self.books[name] = Local_Order_Book(name)
+            self.session.subscribe([self.channel(name) for name in added], self._on_book)
+
+    def add_listener(self, callback):
+        """
+        callback(instrument_name) after every update applied to a book, runs on the session loop
+        """
+        self.listeners.append(callback)
+
+    def get(self, instrument_name, depth=None):
+        """
+        Output: local book levels, None when the instrument is not tracked or not in sync
+        """
+        book = self.books.get(instrument_name)
+        if book is None or not book.synced or not self.session.connected:
+            return None
+        return book.levels(depth)
+
+    def channel(self, instrument_name):
+        return f"book.{instrument_name}.{self.interval}"
+
+    def _on_book(self, channel, data):
+        book = self.books.get(data["instrument_name"])
+        if book is None:
+            return
+        if book.apply(data):
+            self._resyncing.discard(channel)
+            for listener in self.listeners:
+                listener(book.instrument_name)
+        elif channel not in self._resyncing:
+            # change_id gap: resubscribing makes Deribit send a fresh snapshot
+            self._resyncing.add(channel)
+            asyncio.ensure_future(self.session.resubscribe([channel]))
+
+    def _on_disconnect(self):
+        self._resyncing.clear()
+        for book in list(self.books.values()):
+            book.reset()
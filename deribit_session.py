@@ -0,0 +1,381 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+import websockets
+from rate_limiter import Credit_Bucket
+
+TOO_MANY_REQUESTS = 10028
+
+# orders hit the matching engine and have their own, tighter, limit
+MATCHING_ENGINE_METHODS = (
+    "private/buy",
+    "private/sell",
+    "private/edit",
+    "private/cancel",
+    "private/cancel_all",
+    "private/close_position",
+)
+
+
+class Deribit_Session:
+    """
+    Long-lived Deribit websocket connection
+
+    The connection runs on its own event loop in a daemon thread so it stays
+    alive (and answers heartbeats) between scans. Requests are multiplexed over
+    the single socket and matched to their responses by JSON-RPC `id`.
+    Private calls log in once per connection and the access token is refreshed
+    before it expires. Every request goes through a credit bucket so as many
+    requests as the rate limit allows are kept in flight.
+    """
+
+    def __init__(
+        self,
+        url,
+        client_id=None,
+        client_secret=None,
+        heartbeat_interval=10,
+        request_timeout=10,
+        reconnect_delay=1,
+        max_reconnect_delay=30,
+        refresh_margin=60,
+        limits_currency="ETH",
+        max_retries=3,
+        backoff=0.5,
+    ):
+        self.url = url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.heartbeat_interval = heartbeat_interval
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.refresh_margin = refresh_margin
+        self.limits_currency = limits_currency
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # Deribit defaults, replaced by the account limits after the first login
+        self.non_matching_bucket = Credit_Bucket(rate=20, burst=100)
+        self.matching_bucket = Credit_Bucket(rate=5, burst=20)
+        self._limits_loaded = False
+
+        # auth state, survives reconnects so the refresh token can be reused
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = 0
+        self._authenticated = False
+        self._auth_wanted = False
+        self._auth_lock = None
+        self._refresh_task = None
+
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closing = False
+        self._websocket = None
+        self._connected = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+
+        # channel -> callback(channel, data), replayed on every reconnect
+        self._subscriptions = {}
+        self._disconnect_callbacks = []
+
+    ##############################
+    #####   Public section   #####
+    ##############################
+    def start(self):
+        """
+        Start the background loop and connection (no-op when already running)
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closing = False
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="deribit-session", daemon=True)
+            self._thread.start()
+        ready.wait()
+
+    def close(self):
+        """
+        Close the connection and stop the background loop
+        """
+        if self.loop is None or not self._thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self._thread.join()
+
+    @property
+    def connected(self):
+        return self._connected is not None and self._connected.is_set()
+
+    def subscribe(self, channels, callback):
+        """
+        Subscribe to public channels, `callback(channel, data)` runs on the session loop
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._subscribe(list(channels), callback), self.loop).result()
+
+    def unsubscribe(self, channels):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._unsubscribe(list(channels)), self.loop).result()
+
+    def add_disconnect_callback(self, callback):
+        """
+        `callback()` runs on the session loop whenever the connection drops
+        """
+        self._disconnect_callbacks.append(callback)
+
+    def call(self, method, params=None, private=False):
+        """
+        Blocking call, returns the raw JSON-RPC response
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.request(method, params, private), self.loop).result()
+
+    async def acall(self, method, params=None, private=False):
+        """
+        Awaitable call usable from any event loop, returns the raw JSON-RPC response
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.request(method, params, private), self.loop)
+        return await asyncio.wrap_future(future)
+
+    async def request(self, method, params=None, private=False):
+        """
+        Send a request on the session loop once connected (and authenticated if private)
+        and wait for its response
+        """
+        await asyncio.wait_for(self._connected.wait(), self.request_timeout)
+        if private:
+            await self._ensure_authenticated()
+        for attempt in range(self.max_retries + 1):
+            response = await self._request(self._websocket, method, params)
+            if response.get("error", {}).get("code") != TOO_MANY_REQUESTS:
+                break
+            self._bucket(method).back_off(self.backoff * 2**attempt)
+        return response
+
+    ##############################
+    #####  Connection section  ###
+    ##############################
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self._connected = asyncio.Event()
+        self._auth_lock = asyncio.Lock()
+        self.loop.create_task(self._maintain())
+        ready.set()
+        self.loop.run_forever()
+
+    async def _maintain(self):
+        """
+        Keep the websocket connected, reconnecting with exponential backoff
+        """
+        delay = self.reconnect_delay
+        while not self._closing:
+            try:
+                async with websockets.connect(self.url, max_size=None) as websocket:
+                    self._websocket = websocket
+                    reader = asyncio.ensure_future(self._read(websocket))
+                    try:
+                        await self._on_connect(websocket)
+                        self._connected.set()
+                        delay = self.reconnect_delay
+                        await reader
+                    finally:
+                        reader.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._closing:
+                    print(f"Deribit websocket error: {e}. Reconnecting in {delay}s")
+            finally:
+                self._connected.clear()
+                self._websocket = None
+                self._fail_pending(ConnectionError("Deribit websocket disconnected"))
+                for callback in self._disconnect_callbacks:
+                    callback()
+
+            if not self._closing:
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, self.max_reconnect_delay)
+
+    async def _on_connect(self, websocket):
+        """
+        Per-connection setup, runs on every (re)connect
+        """
+        self._authenticated = False
+        if self.heartbeat_interval:
+            await self._request(websocket, "public/set_heartbeat", {"interval": self.heartbeat_interval})
+        if self._auth_wanted:
+            try:
+                await self._login(websocket)
+            except Exception as e:
+                # keep the connection for public calls, the next private request retries the login
+                self._authenticated = False
+                print(f"Deribit login failed on reconnect: {e}")
+        if self._subscriptions:
+            await self._request(websocket, "public/subscribe", {"channels": list(self._subscriptions)})
+
+    async def _read(self, websocket):
+        """
+        Route incoming messages: responses to pending requests, heartbeats to `public/test`,
+        subscription notifications to their channel callback
+        """
+        async for raw in websocket:
+            message = json.loads(raw)
+            msg_id = message.get("id")
+            if msg_id is not None:
+                future = self._pending.pop(msg_id, None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+            elif message.get("method") == "heartbeat":
+                if message["params"]["type"] == "test_request":
+                    asyncio.ensure_future(self._request(websocket, "public/test", {}))
+            elif message.get("method") == "subscription":
+                params = message["params"]
+                callback = self._subscriptions.get(params["channel"])
+                if callback is not None:
+                    callback(params["channel"], params["data"])
+
+    async def _request(self, websocket, method, params):
+        await self._bucket(method).acquire()
+        msg_id = next(self._ids)
+        future = self.loop.create_future()
+        self._pending[msg_id] = future
+        try:
+            await websocket.send(json.dumps({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params or {}}))
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(msg_id, None)
+
+    ##############################
+    ##### Subscription section ###
+    ##############################
+    async def _subscribe(self, channels, callback):
+        for channel in channels:
+            self._subscriptions[channel] = callback
+        await asyncio.wait_for(self._connected.wait(), self.request_timeout)
+        return await self._request(self._websocket, "public/subscribe", {"channels": channels})
+
+    async def _unsubscribe(self, channels):
+        for channel in channels:
+            self._subscriptions.pop(channel, None)
+        if not self.connected:
+            return None
+        return await self._request(self._websocket, "public/unsubscribe", {"channels": channels})
+
+    async def resubscribe(self, channels):
+        """
+        Drop and re-create subscriptions on the session loop, Deribit replies with a fresh snapshot
+        """
+        if not self.connected:
+            return
+        await self._request(self._websocket, "public/unsubscribe", {"channels": channels})
+        await self._request(self._websocket, "public/subscribe", {"channels": channels})
+
+    ##############################
+    #####    Auth section    #####
+    ##############################
+    async def _ensure_authenticated(self):
+        async with self._auth_lock:
+            if not self._authenticated:
+                await self._login(self._websocket)
+
+    async def _login(self, websocket):
+        """
+        Authenticate the connection, with the refresh token when we hold one
+        """
+        response = None
+        if self.refresh_token is not None:
+            params = {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+            response = await self._request(websocket, "public/auth", params)
+        if response is None or "error" in response:
+            if self.client_id is None or self.client_secret is None:
+                raise Exception("Deribit client id/secret are required for private calls")
+            params = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            }
+            response = await self._request(websocket, "public/auth", params)
+        if "error" in response:
+            raise Exception(f"Deribit authentication failed: {response['error']}")
+
+        result = response["result"]
+        self.access_token = result["access_token"]
+        self.refresh_token = result["refresh_token"]
+        self.expires_at = time.time() + result["expires_in"]
+        self._authenticated = True
+        self._auth_wanted = True
+
+        if self._refresh_task is not None and self._refresh_task is not asyncio.current_task():
+            self._refresh_task.cancel()
+        delay = result["expires_in"] - min(self.refresh_margin, result["expires_in"] / 2)
+        self._refresh_task = asyncio.ensure_future(self._refresh_later(websocket, delay))
+
+        if not self._limits_loaded:
+            try:
+                await self._load_limits(websocket)
+            except Exception as e:
+                print(f"Could not read Deribit rate limits, keeping defaults: {e}")
+
+    async def _refresh_later(self, websocket, delay):
+        """
+        Refresh the token on the same connection before it expires
+        """
+        await asyncio.sleep(delay)
+        if websocket is not self._websocket:
+            return
+        try:
+            async with self._auth_lock:
+                await self._login(websocket)
+        except Exception as e:
+            self._authenticated = False
+            print(f"Deribit token refresh failed: {e}")
+
+    ##############################
+    #####   Limits section   #####
+    ##############################
+    def _bucket(self, method):
+        if method in MATCHING_ENGINE_METHODS:
+            return self.matching_bucket
+        return self.non_matching_bucket
+
+    async def _load_limits(self, websocket):
+        """
+        Read the account rate limits (needs an authenticated connection)
+        """
+        params = {"currency": self.limits_currency, "extended": True}
+        response = await self._request(websocket, "private/get_account_summary", params)
+        limits = response.get("result", {}).get("limits")
+        if not limits:
+            return
+        buckets = (("non_matching_engine", self.non_matching_bucket), ("matching_engine", self.matching_bucket))
+        for key, bucket in buckets:
+            limit = limits.get(key)
+            if isinstance(limit, dict):
+                bucket.configure(limit["rate"], limit["burst"])
+            elif limit is not None:
+                bucket.configure(limit, limits.get(f"{key}_burst", bucket.burst))
+        self._limits_loaded = True
+
+    def _fail_pending(self, exc):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _shutdown(self):
+        self._closing = True
+        if self._websocket is not None:
+            await self._websocket.close()
+        for task in asyncio.all_tasks(self.loop):
+            if task is not asyncio.current_task():
+                task.cancel()
+        self.loop.call_soon(self.loop.stop)
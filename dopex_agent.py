@@ -1,51 +1,20 @@
-import os, sys, json
-from datetime import datetime
+import os, time, threading
+import numpy as np
 import web3
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
 from dotenv import load_dotenv
+from dopex_pricer import Dopex_Pricer
+from chain_snapshot import Chain_Snapshot
+from providers import registry
+from abi_loader import load_abi, load_contract_addresses
+from calldata import get_template
+from decoding import decode_uint256
+from tx_pipeline import Tx_Pipeline
+from instrument_registry import get_instrument_registry
 
 load_dotenv()
 
 MAX_UINT = int(web3.constants.MAX_INT, 16)
 unit = 10**18
-path = "/".join(sys.path[0].split("/")[:0])
-
-
-with open(os.path.join(path, "constants/contract_addresses.json"), "r") as jsonFile:
-    contract_addresses = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/ethweekly_abi.json"), "r") as jsonFile:
-    ethweekly_abi = json.load(jsonFile)
-    jsonFile.close()
-
-
-with open(os.path.join(path, "abis/multicall_abi.json"), "r") as jsonFile:
-    multicall_abi = json.load(jsonFile)
-    jsonFile.close()
-
-
-with open(os.path.join(path, "abis/erc20_abi.json"), "r") as jsonFile:
-    erc20_abi = json.load(jsonFile)
-    jsonFile.close()
-
-
-str_month = {
-    1: "JAN",
-    2: "FEB",
-    3: "MAR",
-    4: "APR",
-    5: "MAY",
-    6: "JUN",
-    7: "JUL",
-    8: "AUG",
-    9: "SEP",
-    10: "OCT",
-    11: "NOV",
-    12: "DEC",
-}
-month_to_int = {v: k for k, v in str_month.items()}
 
 
 class Dopex_Agent:
@@ -53,19 +22,42 @@ class Dopex_Agent:
         self.wallet = config.get("wallet")
         self.private_key = os.getenv("PRIVATE_KEY")
         self.spot = config.get("spot", "ETH")
+        self.instrument_registry = get_instrument_registry(self.spot)
 
-        self.w3 = Web3(Web3.HTTPProvider(os.getenv("ARBITRUM_RPC_URL")))
-        self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        self.w3 = registry.get_web3("arbitrum")
 
         # contracts
-        self.multicall = self.w3.eth.contract(
-            address=contract_addresses["arbitrum"]["multicall"]["address"], abi=multicall_abi
+        contract_addresses = load_contract_addresses()
+        self.multicall = registry.get_contract(
+            "arbitrum", contract_addresses["arbitrum"]["multicall"]["address"], load_abi("multicall_abi")
         )
-        self.ethweekly = self.w3.eth.contract(
-            address=contract_addresses["arbitrum"]["ethweekly"]["address"], abi=ethweekly_abi
+        self.ethweekly = registry.get_contract(
+            "arbitrum", contract_addresses["arbitrum"]["ethweekly"]["address"], load_abi("ethweekly_abi")
         )
-
+        # quotes of one scan are read at one pinned block, see Chain_Snapshot.pin
+        self.snapshot = Chain_Snapshot(self.w3, self.multicall)
+        # arbitrum chain id
+        self.tx_pipeline = Tx_Pipeline(self.w3, 42161, self.private_key, gas_price_ttl=config.get("gas_price_ttl", 5))
+
+        # epoch cache, see get_live_strikes
+        self.epoch = None
+        self.epoch_expiry = None
+        self.epoch_strikes = None
+        self._epoch_lock = threading.Lock()
         self.strikes = self.get_live_strikes()
+        if config.get("epoch_watch_interval"):
+            self.start_epoch_watcher(config["epoch_watch_interval"])
+
+        # quotes priced locally from on-chain inputs read once per block, see Dopex_Pricer
+        self.local_pricing = config.get("local_pricing", True)
+        self.pricer = Dopex_Pricer(
+            self.ethweekly,
+            self.snapshot,
+            refresh_interval=config.get("pricer_refresh_interval", 2),
+            cross_check_interval=config.get("pricer_cross_check_interval", 300),
+            drift_tolerance=config.get("pricer_drift_tolerance", 0.01),
+            min_option_price_pct=config.get("pricer_min_option_price_pct", 0),
+        )
 
     #########################
     ######## Quoting #######
@@ -75,101 +67,107 @@ class Dopex_Agent:
         """
         Return dopex call price for strike and expiry
         """
+        if self.local_pricing:
+            return float(self.pricer.get_quotes([strike], expiry, [1])[0, 0])
         strike = int(strike * 10**8)
         calldatas = [
-            self.ethweekly.functions.calculatePremium(strike, 10**18, expiry)._encode_transaction_data(),
-            self.ethweekly.functions.calculatePurchaseFees(strike, 10**18)._encode_transaction_data(),
+            get_template(self.ethweekly, "calculatePremium").encode(strike, 10**18, expiry),
+            get_template(self.ethweekly, "calculatePurchaseFees").encode(strike, 10**18),
         ]
         calls = [{"target": self.ethweekly.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall.functions.aggregate(calls).call()
-        price = int(rets[1][0].hex(), 16)
-        fee = int(rets[1][1].hex(), 16)
-        final_price = (price + fee) / 1e18
+        rets = self.snapshot.aggregate(calls)
+        final_price = float(decode_uint256(rets[1], scale=1e18).sum())
         return final_price
 
     def get_call_prices(self, strikes, expiry):
         """
         Return dopex call prices for strikes and expiry
         """
+        if self.local_pricing:
+            return self.pricer.get_quotes(strikes, expiry, [1])[:, 0].tolist()
         strikes = [int(strike * 10**8) for strike in strikes]
-        calldatas = [
-            self.ethweekly.functions.calculatePremium(strike, 10**18, expiry)._encode_transaction_data()
-            for strike in strikes
-        ] + [
-            self.ethweekly.functions.calculatePurchaseFees(strike, 10**18)._encode_transaction_data()
-            for strike in strikes
+        calculate_premium = get_template(self.ethweekly, "calculatePremium")
+        calculate_purchase_fees = get_template(self.ethweekly, "calculatePurchaseFees")
+        calldatas = [calculate_premium.encode(strike, 10**18, expiry) for strike in strikes] + [
+            calculate_purchase_fees.encode(strike, 10**18) for strike in strikes
         ]
 
         calls = [{"target": self.ethweekly.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall.functions.aggregate(calls).call()[1]
-        n = len(rets)
-        prices = [int(price.hex(), 16) for price in rets[: n // 2]]
-        fees = [int(fee.hex(), 16) for fee in rets[n // 2 :]]
-        final_prices = [(price + fee) / 1e18 for (price, fee) in zip(prices, fees)]
+        rets = self.snapshot.aggregate(calls)[1]
+        prices, fees = decode_uint256(rets, scale=1e18).reshape(2, -1)
+        final_prices = (prices + fees).tolist()
         return final_prices
 
     def get_call_quote(self, strike, expiry, amount):
         """
         Return dopex quotes for specific (strike_id, expiry)
         """
+        if self.local_pricing:
+            return float(self.pricer.get_quotes([strike], expiry, [amount])[0, 0])
         strike = int(strike * 10**8)
         amount = int(amount * 10**18)
         calldatas = [
-            self.ethweekly.functions.calculatePremium(strike, amount, expiry)._encode_transaction_data(),
-            self.ethweekly.functions.calculatePurchaseFees(strike, amount)._encode_transaction_data(),
+            get_template(self.ethweekly, "calculatePremium").encode(strike, amount, expiry),
+            get_template(self.ethweekly, "calculatePurchaseFees").encode(strike, amount),
         ]
         calls = [{"target": self.ethweekly.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall.functions.aggregate(calls).call()
-        price = int(rets[1][0].hex(), 16)
-        fee = int(rets[1][1].hex(), 16)
-        final_price = (price + fee) / 1e18
+        rets = self.snapshot.aggregate(calls)
+        final_price = float(decode_uint256(rets[1], scale=1e18).sum())
         return final_price
 
     def get_call_quotes(self, strike, expiry, amounts):
         """
         Return dopex quotes for specific (strike_id, expiry)
         """
-        strike = int(strike * 10**8)
+        return self.get_call_surface([strike], expiry, amounts)[0].tolist()
+
+    def get_call_surface(self, strikes, expiry, amounts):
+        """
+        Output: array (len(strikes), len(amounts)) of premium + purchase fees in ETH, one multicall
+        expiry: one timestamp for every strike or one per strike
+        """
+        expiries = list(expiry) if np.ndim(expiry) else [expiry] * len(strikes)
+        if self.local_pricing:
+            quotes = np.empty((len(strikes), len(amounts)))
+            rows_by_expiry = {}
+            for row, row_expiry in enumerate(expiries):
+                rows_by_expiry.setdefault(row_expiry, []).append(row)
+            for row_expiry, rows in rows_by_expiry.items():
+                quotes[rows] = self.pricer.get_quotes([strikes[row] for row in rows], row_expiry, amounts)
+            return quotes
+        strikes = [int(strike * 10**8) for strike in strikes]
         amounts = [int(amount * 10**18) for amount in amounts]
+        calculate_premium = get_template(self.ethweekly, "calculatePremium")
+        calculate_purchase_fees = get_template(self.ethweekly, "calculatePurchaseFees")
         calldatas = [
-            self.ethweekly.functions.calculatePremium(strike, amount, expiry)._encode_transaction_data()
+            calculate_premium.encode(strike, amount, row_expiry)
+            for strike, row_expiry in zip(strikes, expiries)
             for amount in amounts
-        ] + [
-            self.ethweekly.functions.calculatePurchaseFees(strike, amount)._encode_transaction_data()
-            for amount in amounts
-        ]
+        ] + [calculate_purchase_fees.encode(strike, amount) for strike in strikes for amount in amounts]
 
         calls = [{"target": self.ethweekly.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall.functions.aggregate(calls).call()[1]
-        n = len(rets)
-        prices = [int(price.hex(), 16) for price in rets[: n // 2]]
-        fees = [int(fee.hex(), 16) for fee in rets[n // 2 :]]
-        final_prices = [(price + fee) / 1e18 for (price, fee) in zip(prices, fees)]
-        return final_prices
+        rets = self.snapshot.aggregate(calls)[1]
+        prices, fees = decode_uint256(rets, scale=1e18).reshape(2, len(strikes), len(amounts))
+        return prices + fees
 
     def get_eth_price(self):
-        return self.ethweekly.functions.getCollateralPrice().call() / 1e8
+        return self.ethweekly.functions.getCollateralPrice().call(block_identifier=self.snapshot.block_identifier) / 1e8
 
     #########################
     ######## Trading #######
     #########################
 
-    def buy_call(self, strike, expiry, amount):
+    def buy_call(self, strike, expiry, amount, wait=True):
+        """
+        Buy amount calls of strike, returns the receipt or, with wait=False, a future of the receipt
+        """
         strike_idx = self.strike_to_idx[strike]
         amount = int(10**18 * amount)
-        w3 = self.w3
-        buy_tx = self.ethweekly.functions.purchase(strike_idx, amount, self.wallet).buildTransaction(
-            {
-                "chainId": 42161,  # arbitrum chain id
-                "gasPrice": w3.eth.gas_price,
-                "from": self.wallet,
-                "nonce": w3.eth.getTransactionCount(self.wallet),
-            }
-        )
-        signed_buy_tx = w3.eth.account.sign_transaction(buy_tx, private_key=self.private_key)
-        buy_tx_hash = w3.eth.send_raw_transaction(signed_buy_tx.rawTransaction)
+        purchase = self.ethweekly.functions.purchase(strike_idx, amount, self.wallet)
+        buy_tx_hash, tx_receipt = self.tx_pipeline.submit(purchase, self.wallet)
         print(f"transaction link: https://arbiscan.io/tx/{buy_tx_hash.hex()}")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(buy_tx_hash)
+        if wait:
+            return tx_receipt.result()
         return tx_receipt
 
     #########################
@@ -177,59 +175,82 @@ class Dopex_Agent:
     #########################
 
     def get_token_balance(self, token, network="arbitrum"):
-        network = network.lower()
-        w3 = Web3(Web3.HTTPProvider(os.getenv(f"{network.upper()}_RPC_URL")))
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-        token_address = contract_addresses[network][token]["address"]
-        token_contract = w3.eth.contract(address=token_address, abi=erc20_abi)
-        decimals = contract_addresses[network][token]["decimals"]
+        return self.get_token_balances([token], network)[token]
+
+    def get_token_balances(self, tokens, network="arbitrum"):
+        """
+        Return {token: balance} of the wallet, one multicall on the pooled provider of network
+        """
         try:
-            balance = token_contract.functions.balanceOf(self.wallet).call()
+            balances = registry.get_token_balances(self.wallet, tokens, network)
         except:
             try:
-                balance = token_contract.functions.balanceOf(self.wallet).call()
+                balances = registry.get_token_balances(self.wallet, tokens, network)
             except:
-                raise Exception(f"Failed to get {token} balance twice on {network}")
-        return balance / 10**decimals
+                raise Exception(f"Failed to get {', '.join(tokens)} balances twice on {network}")
+        return balances
 
-    def get_live_strikes(self):
+    def get_live_strikes(self, force=False):
         """'
-        Get live boards from dopex
+        Get live strikes from dopex
+        NOTE: cached per epoch. No RPC at all until the cached epoch expires, then only `currentEpoch`
+              is read until the next epoch is bootstrapped and its data fetched
         """
-        current_epoch = self.ethweekly.functions.currentEpoch().call()
-        epoch_data = self.ethweekly.functions.getEpochData(current_epoch).call()
-        strikes = epoch_data[7]
-        strikes = [int(strike / 10**8) for strike in strikes]
-        self.strike_to_idx = {}
-        for i in range(len(strikes)):
-            self.strike_to_idx[strikes[i]] = i
-        return strikes
+        with self._epoch_lock:
+            if not force and self.epoch is not None and time.time() < self.epoch_expiry:
+                return self.epoch_strikes
+            current_epoch = self.ethweekly.functions.currentEpoch().call()
+            if not force and current_epoch == self.epoch:
+                return self.epoch_strikes
+
+            epoch_data = self.ethweekly.functions.getEpochData(current_epoch).call()
+            strikes = epoch_data[7]
+            strikes = [int(strike / 10**8) for strike in strikes]
+            strike_to_idx = {strike: i for i, strike in enumerate(strikes)}
+            # built aside and swapped in at once, readers outside the lock never see a partial map
+            self.strike_to_idx, self.epoch_strikes = strike_to_idx, strikes
+            self.epoch = current_epoch
+            self.epoch_expiry = epoch_data[2]
+            return strikes
+
+    def get_live_expiries(self):
+        """
+        expiry -> live strikes, for every Dopex expiry that can be bought (the current epoch of the SSOV)
+        """
+        strikes = self.get_live_strikes()
+        return {self.epoch_expiry: strikes}
+
+    def start_epoch_watcher(self, interval=60):
+        """
+        Keep the epoch cache warm from a daemon thread so get_live_strikes stays a memory read
+        """
+
+        def watch():
+            while True:
+                try:
+                    self.get_live_strikes()
+                except Exception as e:
+                    print(f"Dopex epoch refresh failed: {e}")
+                time.sleep(interval)
+
+        watcher = threading.Thread(target=watch, name="dopex-epoch-watcher", daemon=True)
+        watcher.start()
+        return watcher
 
     def get_timestamp_key(self, timestamp):
-        date = datetime.fromtimestamp(timestamp)
-        year = str(date.year)
-        month = str_month[date.month]
-        day = str(date.day)
-        return self.spot + "-" + day + month + year[-2:] + "-"
+        return self.instrument_registry.timestamp_key(timestamp)
 
-    @staticmethod
-    def get_strike_from_name(instrument_name):
+    def get_strike_from_name(self, instrument_name):
         """
         e.g INPUT = "ETH-2SEP22-800-C" -> OUTPUT = 800
         """
-        strike = int(instrument_name.split("-")[-2])
-        return strike
+        return self.instrument_registry.resolve(instrument_name).strike
 
-    @staticmethod
-    def get_expiry_timestamp_from_name(instrument_name):
+    def get_expiry_timestamp_from_name(self, instrument_name):
         """
-        e.g INPUT = "ETH-2SEP22-800-C" -> OUTPUT = 800
+        e.g INPUT = "ETH-2SEP22-800-C" -> OUTPUT = expiry timestamp
         """
-        date = instrument_name.split("-")[1]
-        year = 2000 + int(date[-2:])
-        month = month_to_int[date[-5:-2]]
-        day = int(date[:-5])
-        return int(datetime(year, month, day).timestamp())
+        return self.instrument_registry.resolve(instrument_name).expiry
 
 
 config = {"wallet": "0x"}
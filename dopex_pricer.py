@@ -0,0 +1,186 @@
+import time
+import numpy as np
+from calldata import get_template
+from decoding import decode_uint256
+
+SECONDS_PER_CENTIDAY = 864  # OptionPricingSimple works in 1/100 days
+CENTIDAYS_PER_YEAR = 36500
+
+
+def norm_cdf(x):
+    """
+    Vectorized standard normal CDF (Abramowitz & Stegun 26.2.17, |error| < 7.5e-8)
+    """
+    x = np.asarray(x, dtype=float)
+    t = 1 / (1 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    tail = np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi) * poly
+    return np.where(x >= 0, 1 - tail, tail)
+
+
+def black_scholes_call(spot, strikes, time_to_expiry, volatility):
+    """
+    Black-Scholes call price with zero rates, as used by the SSOV option pricing contract
+    spot: underlying price, strikes: array, time_to_expiry: years, volatility: array of decimals
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    if time_to_expiry <= 0:
+        return np.maximum(spot - strikes, 0.0)
+    std = volatility * np.sqrt(time_to_expiry)
+    d1 = (np.log(spot / strikes) + 0.5 * std**2) / std
+    d2 = d1 - std
+    return spot * norm_cdf(d1) - strikes * norm_cdf(d2)
+
+
+class Dopex_Pricer:
+    """
+    Off-chain replica of the SSOV `calculatePremium` + `calculatePurchaseFees` quote
+
+    Pricing inputs (underlying/collateral price, per strike volatility and per unit
+    purchase fee) are read in one multicall at most once per block (the pinned block of
+    the Chain_Snapshot when there is one), then any strike x size grid is priced with
+    NumPy. A periodic on-chain cross-check measures the drift against `calculatePremium`
+    and calibrates the local premiums; strikes priced 0 locally (deep OTM) are floored at
+    their on-chain premium instead.
+    min_option_price_pct: `minOptionPricePercentage` of the SSOV option pricing contract
+    (not in the trimmed SSOV ABI, so it comes from config)
+    """
+
+    def __init__(
+        self,
+        ssov,
+        snapshot,
+        refresh_interval=2,
+        cross_check_interval=300,
+        drift_tolerance=0.01,
+        min_option_price_pct=0,
+    ):
+        self.ssov = ssov
+        self.snapshot = snapshot
+        self.multicall = snapshot.multicall
+        self.refresh_interval = refresh_interval
+        self.cross_check_interval = cross_check_interval
+        self.drift_tolerance = drift_tolerance
+        self.min_option_price_pct = min_option_price_pct
+
+        self.strikes = np.array([], dtype=float)
+        self.block_number = None
+        self.block_timestamp = None
+        self.refreshed_at = 0
+        self.underlying_price = None
+        self.collateral_price = None
+        self.volatilities = None
+        self.fees = None
+
+        self.calibration = {}  # (strike, expiry) -> on-chain premium / local premium
+        self.premium_floors = {}  # (strike, expiry) -> on-chain premium of strikes priced 0 locally
+        self.drift = None
+        self.cross_checked_at = {}
+
+    def refresh(self, strikes, force=False):
+        """
+        Read pricing inputs for strikes (in USD), skipped while still fresh for the current block
+        """
+        strikes = np.asarray(strikes, dtype=float)
+        known = np.isin(strikes, self.strikes).all()
+        block_number = self.snapshot.block_number
+        if block_number is None:
+            if not force and known and time.time() - self.refreshed_at < self.refresh_interval:
+                return
+            block_number = self.snapshot.w3.eth.block_number
+        if not force and known and block_number == self.block_number:
+            return
+
+        strikes = np.union1d(self.strikes, strikes)
+        get_volatility = get_template(self.ssov, "getVolatility")
+        calculate_purchase_fees = get_template(self.ssov, "calculatePurchaseFees")
+        calldatas = [
+            get_template(self.ssov, "getUnderlyingPrice").encode(),
+            get_template(self.ssov, "getCollateralPrice").encode(),
+            get_template(self.multicall, "getCurrentBlockTimestamp").encode(),
+        ]
+        calldatas += [get_volatility.encode(int(strike * 10**8)) for strike in strikes]
+        calldatas += [calculate_purchase_fees.encode(int(strike * 10**8), 10**18) for strike in strikes]
+        calls = [
+            {"target": self.multicall.address if i == 2 else self.ssov.address, "callData": cd}
+            for i, cd in enumerate(calldatas)
+        ]
+        rets = self.snapshot.aggregate(calls)[1]
+        values = decode_uint256(rets)
+        n = len(strikes)
+
+        self.strikes = strikes
+        self.block_number = block_number
+        self.underlying_price = values[0] / 1e8
+        self.collateral_price = values[1] / 1e8
+        self.block_timestamp = int(values[2])
+        self.volatilities = values[3 : 3 + n] / 100
+        self.fees = values[3 + n :] / 1e18
+        self.refreshed_at = time.time()
+
+    def get_quotes(self, strikes, expiry, amounts):
+        """
+        Output: array (len(strikes), len(amounts)) of premium + purchase fees in ETH
+        """
+        strikes = np.asarray(strikes, dtype=float)
+        amounts = np.asarray(amounts, dtype=float)
+        self.refresh(strikes)
+        if time.time() - self.cross_checked_at.get(expiry, 0) > self.cross_check_interval:
+            self.cross_check(expiry)
+
+        idx = np.searchsorted(self.strikes, strikes)
+        premiums = self.get_premiums(idx, expiry)
+        unit_prices = premiums + self.fees[idx]
+        return unit_prices[:, None] * amounts[None, :]
+
+    def get_premiums(self, idx, expiry):
+        """
+        Local premium in ETH for one option of the strikes at positions idx of self.strikes
+        """
+        strikes = self.strikes[idx]
+        time_to_expiry = ((expiry - self.block_timestamp) // SECONDS_PER_CENTIDAY) / CENTIDAYS_PER_YEAR
+        prices = black_scholes_call(self.underlying_price, strikes, time_to_expiry, self.volatilities[idx])
+        min_price = self.underlying_price * self.min_option_price_pct / 100
+        prices = np.maximum(prices, min_price)
+        calibration = np.array([self.calibration.get((strike, expiry), 1.0) for strike in strikes])
+        floors = np.array([self.premium_floors.get((strike, expiry), 0.0) for strike in strikes])
+        return np.maximum(prices / self.collateral_price * calibration, floors)
+
+    def cross_check(self, expiry):
+        """
+        Compare local premiums against on-chain `calculatePremium` for every known strike
+        and recalibrate, warns when the raw drift exceeds drift_tolerance
+        """
+        calculate_premium = get_template(self.ssov, "calculatePremium")
+        calldatas = [calculate_premium.encode(int(strike * 10**8), 10**18, expiry) for strike in self.strikes]
+        calls = [{"target": self.ssov.address, "callData": cd} for cd in calldatas]
+        rets = self.snapshot.aggregate(calls)[1]
+        onchain = decode_uint256(rets, scale=1e18)
+
+        previous = {
+            strike: (self.calibration.pop((strike, expiry), None), self.premium_floors.pop((strike, expiry), None))
+            for strike in self.strikes
+        }
+        local = self.get_premiums(np.arange(len(self.strikes)), expiry)
+        # strikes whose on-chain premium could not be read keep their previous calibration
+        checked = np.isfinite(onchain)
+        priced = checked & (local > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(priced, onchain / local, 1.0)
+        if priced.any():
+            self.drift = float(np.max(np.abs(ratios[priced] - 1)))
+        if self.drift is not None and self.drift > self.drift_tolerance:
+            print(f"Dopex local pricing drifted {round(100 * self.drift, 2)}% from on-chain, recalibrating")
+        for strike, ratio, premium, ok, positive in zip(self.strikes, ratios, onchain, checked, priced):
+            calibration, floor = previous[strike]
+            if positive:
+                self.calibration[(strike, expiry)] = ratio
+            elif ok:
+                # no ratio of a 0 local premium, the on-chain premium is used as is
+                self.premium_floors[(strike, expiry)] = premium
+            else:
+                if calibration is not None:
+                    self.calibration[(strike, expiry)] = calibration
+                if floor is not None:
+                    self.premium_floors[(strike, expiry)] = floor
+        self.cross_checked_at[expiry] = time.time()
@@ -0,0 +1,156 @@
+import asyncio
+import signal
+
+
+class Arbitrage_Engine:
+    """
+    Event driven scan loop replacing the sleep loop of the trading bots
+
+    Market data events mark instruments dirty: a Deribit book tick marks its instrument, a new
+    block on a watched chain marks the instruments quoted on that chain (on-chain quotes move
+    with the block), at most once per block_scan_interval so fast chains do not turn every
+    evaluation into a full scan. One evaluation task drains the dirty set as soon as it is non
+    empty, coalescing the events that arrive while it runs, so the delay from a price change to
+    a decision is the evaluation time. SIGINT/SIGTERM let the running evaluation finish before the engine returns.
+    """
+
+    def __init__(
+        self,
+        on_update,
+        chains=None,
+        chain_instruments=None,
+        refresh=None,
+        refresh_interval=300,
+        max_idle=60,
+        block_poll_interval=0.5,
+        block_scan_interval=5,
+    ):
+        self.on_update = on_update  # on_update(instrument names or None for all), runs in a worker thread
+        self.chains = chains or {}  # network -> Web3, polled for new blocks
+        self.chain_instruments = chain_instruments  # network -> names quoted on that chain, every name if None
+        self.refresh = refresh  # e.g Arbitrager.update, new strikes/boards
+        self.refresh_interval = refresh_interval
+        self.max_idle = max_idle  # full scan when no event arrived for that long
+        self.block_poll_interval = block_poll_interval
+        self.block_scan_interval = block_scan_interval  # min seconds between two block triggered marks of a chain
+
+        self.loop = None
+        self.blocks = {}
+        self.evaluations = 0
+        self._dirty = set()
+        self._all_dirty = True
+        self._refresh_due = False
+        self._wakeup = None
+        self._stopping = None
+
+    def notify(self, instrument_name):
+        """
+        Mark one instrument dirty, thread-safe (e.g. a Book_Engine listener on the session loop)
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._mark, instrument_name)
+
+    def notify_all(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._mark, None)
+
+    def stop(self):
+        """
+        Ask the engine to return once the running evaluation is done, thread-safe
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._wakeup.set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # not on the main thread / not supported, stop() still works
+
+        tasks = [asyncio.ensure_future(self._watch_blocks(network, w3)) for network, w3 in self.chains.items()]
+        if self.refresh is not None:
+            tasks.append(asyncio.ensure_future(self._refresh_periodically()))
+        try:
+            await self._evaluate_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self.loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            print("engine stopped")
+
+    def _mark(self, instrument_name):
+        if instrument_name is None:
+            self._all_dirty = True
+        else:
+            self._dirty.add(instrument_name)
+        self._wakeup.set()
+
+    async def _evaluate_forever(self):
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        try:
+            while not self._stopping.is_set():
+                wakeup = asyncio.ensure_future(self._wakeup.wait())
+                await asyncio.wait({wakeup, stopping}, timeout=self.max_idle, return_when=asyncio.FIRST_COMPLETED)
+                wakeup.cancel()
+                if self._stopping.is_set():
+                    break
+                if not self._wakeup.is_set():
+                    self._all_dirty = True  # idle for max_idle seconds
+                self._wakeup.clear()
+
+                instrument_names = None if self._all_dirty else self._dirty
+                self._dirty, self._all_dirty = set(), False
+                try:
+                    if self._refresh_due:
+                        self._refresh_due = False
+                        await self.loop.run_in_executor(None, self.refresh)
+                    await self.loop.run_in_executor(None, self.on_update, instrument_names)
+                except Exception as e:
+                    # stale strikes/boards are the usual cause, refresh before the next evaluation
+                    print(f"evaluation failed: {e}")
+                    self._refresh_due = self.refresh is not None
+                self.evaluations += 1
+        finally:
+            stopping.cancel()
+
+    def _mark_chain(self, network):
+        instrument_names = None if self.chain_instruments is None else self.chain_instruments(network)
+        if instrument_names is None:
+            self._mark(None)
+            return
+        self._dirty.update(instrument_names)
+        self._wakeup.set()
+
+    async def _watch_blocks(self, network, w3):
+        # a block seen within block_scan_interval of the last mark is marked once the interval is over
+        pending, marked_at = False, None
+        while True:
+            try:
+                block_number = await self.loop.run_in_executor(None, lambda: w3.eth.block_number)
+                if block_number != self.blocks.get(network):
+                    self.blocks[network] = block_number
+                    pending = True
+            except Exception as e:
+                print(f"{network} block poll failed: {e}")
+            now = self.loop.time()
+            if pending and (marked_at is None or now - marked_at >= self.block_scan_interval):
+                pending, marked_at = False, now
+                self._mark_chain(network)
+            await asyncio.sleep(self.block_poll_interval)
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            # run by the evaluation task, so a refresh never overlaps a scan
+            self._refresh_due = True
+            self._mark(None)
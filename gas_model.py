@@ -0,0 +1,143 @@
+import time
+import threading
+from providers import registry
+from calldata import get_template
+from decoding import decode_ints
+
+# fallbacks when a transaction cannot be estimated (e.g. wallet without funds or allowance)
+DEFAULT_GAS_LIMITS = {
+    "purchase": 1_000_000,
+    "openPosition": 1_500_000,
+}
+DEFAULT_CALLDATA_SIZES = {
+    "purchase": 100,
+    "openPosition": 292,
+}
+L1_SIGNATURE_PADDING = 68  # bytes the Optimism oracle adds for the signature
+
+
+class Gas_Model:
+    """
+    USD cost of the on-chain legs of a trade
+
+    L2 gas prices (and on Optimism the L1 data fee parameters of the gas price oracle)
+    are read once per block, gas limits are estimated once per `estimate_ttl` seconds,
+    so costing a candidate is a memory read.
+    """
+
+    def __init__(self, snapshots, gas_limits=None, estimate_ttl=600):
+        self.snapshots = snapshots  # network -> Chain_Snapshot
+        self.gas_limits = dict(DEFAULT_GAS_LIMITS, **(gas_limits or {}))
+        self.estimate_ttl = estimate_ttl
+
+        self.actions = {}
+        self._estimates = {}
+        self._fee_params = {}
+        self._lock = threading.Lock()
+
+        contract_addresses = registry.contract_addresses()
+        if "optimism" in snapshots:
+            self.gas_price_oracle = registry.get_contract(
+                "optimism",
+                contract_addresses["optimism"]["gas_price_oracle"]["address"],
+                registry.load_abi("gas_price_oracle_abi"),
+            )
+        self.eth_usd_feed = registry.get_contract(
+            "optimism", contract_addresses["optimism"]["gas_price_feed"]["address"], registry.load_abi("price_feed_abi")
+        )
+        self.eth_usd_decimals = contract_addresses["optimism"]["gas_price_feed"]["decimals"]
+
+    def register(self, name, network, build, wallet):
+        """
+        build: () -> contract function of a representative `name` transaction sent by wallet on network
+        """
+        self.actions[name] = (network, build, wallet)
+
+    def get_cost(self, name, eth_usd=None):
+        """
+        Output: USD cost of one `name` transaction (L2 execution + L1 data fee where it applies)
+        """
+        network, build, wallet = self.actions[name]
+        gas, data_gas = self.estimate_gas(name)
+        fee_params = self.get_fee_params(network)
+        cost = gas * fee_params["gas_price"]
+        if network == "optimism":
+            cost += self.get_l1_fee(data_gas, fee_params)
+        if eth_usd is None:
+            eth_usd = self.get_eth_usd()
+        return cost / 1e18 * eth_usd
+
+    def get_costs(self, names, eth_usd=None):
+        if eth_usd is None:
+            eth_usd = self.get_eth_usd()
+        return sum(self.get_cost(name, eth_usd) for name in names)
+
+    def estimate_gas(self, name):
+        """
+        Output: (gas limit, L1 gas of the calldata), cached for estimate_ttl seconds
+        """
+        with self._lock:
+            cached = self._estimates.get(name)
+            if cached is not None and time.time() - cached[2] < self.estimate_ttl:
+                return cached[0], cached[1]
+
+        network, build, wallet = self.actions[name]
+        gas = self.gas_limits[name]
+        # worst case (all non-zero bytes) until the real calldata is known
+        data_gas = 16 * DEFAULT_CALLDATA_SIZES.get(name, 0)
+        try:
+            contract_function = build()
+            calldata = bytes.fromhex(contract_function._encode_transaction_data()[2:])
+            zeros = calldata.count(0)
+            data_gas = 4 * zeros + 16 * (len(calldata) - zeros)
+            gas = contract_function.estimateGas({"from": wallet})
+        except Exception:
+            pass
+        with self._lock:
+            self._estimates[name] = (gas, data_gas, time.time())
+        return gas, data_gas
+
+    def get_fee_params(self, network):
+        """
+        Gas price (and L1 fee parameters on Optimism) of the current block, read once per block
+        """
+        snapshot = self.snapshots[network]
+        block_number = snapshot.block_number
+        if block_number is None:
+            block_number = snapshot.w3.eth.block_number
+        with self._lock:
+            cached = self._fee_params.get(network)
+            if cached is not None and cached[0] == block_number:
+                return cached[1]
+
+        if network == "optimism":
+            calldatas = [
+                get_template(self.gas_price_oracle, name).encode()
+                for name in ("gasPrice", "l1BaseFee", "overhead", "scalar", "decimals")
+            ]
+            calls = [{"target": self.gas_price_oracle.address, "callData": cd} for cd in calldatas]
+            values = decode_ints(snapshot.aggregate(calls)[1])
+            fee_params = {
+                "gas_price": values[0],
+                "l1_base_fee": values[1],
+                "overhead": values[2],
+                "scalar": values[3],
+                "decimals": values[4],
+            }
+        else:
+            fee_params = {"gas_price": snapshot.w3.eth.gas_price}
+
+        with self._lock:
+            self._fee_params[network] = (block_number, fee_params)
+        return fee_params
+
+    @staticmethod
+    def get_l1_fee(data_gas, fee_params):
+        """
+        Optimism L1 data fee in wei, same formula as the oracle's getL1Fee
+        """
+        l1_gas = data_gas + 16 * L1_SIGNATURE_PADDING + fee_params["overhead"]
+        return l1_gas * fee_params["l1_base_fee"] * fee_params["scalar"] / 10 ** fee_params["decimals"]
+
+    def get_eth_usd(self):
+        return self.eth_usd_feed.functions.latestRoundData().call()[1] / 10**self.eth_usd_decimals
@@ -0,0 +1,132 @@
+import sys
+import time
+import threading
+from datetime import datetime, timezone
+
+str_month = {
+    1: "JAN",
+    2: "FEB",
+    3: "MAR",
+    4: "APR",
+    5: "MAY",
+    6: "JUN",
+    7: "JUL",
+    8: "AUG",
+    9: "SEP",
+    10: "OCT",
+    11: "NOV",
+    12: "DEC",
+}
+month_to_int = {v: k for k, v in str_month.items()}
+
+
+class Instrument:
+    """
+    One option in the Deribit naming, e.g "ETH-21OCT22-1300-C"
+    strike_id: Lyra strike id, strike_idx: Dopex strike index, None where the venue does not list it
+    """
+
+    __slots__ = ("instrument_name", "spot", "expiry", "strike", "option", "strike_id", "strike_idx")
+
+    def __init__(self, instrument_name, spot, expiry, strike, option, strike_id=None, strike_idx=None):
+        self.instrument_name = instrument_name
+        self.spot = spot
+        self.expiry = expiry
+        self.strike = strike
+        self.option = option
+        self.strike_id = strike_id
+        self.strike_idx = strike_idx
+
+    def __repr__(self):
+        return f"Instrument({self.instrument_name}, strike_id={self.strike_id}, strike_idx={self.strike_idx})"
+
+
+class Instrument_Registry:
+    """
+    Interned instrument records of one spot, name -> Instrument in O(1)
+
+    Venues register their instruments when their boards or epoch are refreshed; a name nobody
+    registered is parsed once on first lookup and kept, so no lookup re-parses a name string.
+    """
+
+    def __init__(self, spot):
+        self.spot = spot
+        self.instruments = {}
+        self._timestamp_keys = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, instrument_name):
+        return self.resolve(instrument_name)
+
+    def __contains__(self, instrument_name):
+        return instrument_name in self.instruments
+
+    def __iter__(self):
+        return iter(list(self.instruments.values()))
+
+    def __len__(self):
+        return len(self.instruments)
+
+    def timestamp_key(self, timestamp):
+        """
+        e.g INPUT = 1666339200 -> OUTPUT = "ETH-21OCT22-"
+        NOTE: UTC date, as in Deribit names
+        """
+        key = self._timestamp_keys.get(timestamp)
+        if key is None:
+            date = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+            key = f"{self.spot}-{date.day}{str_month[date.month]}{str(date.year)[-2:]}-"
+            self._timestamp_keys[timestamp] = key
+        return key
+
+    def register(self, expiry, strike, option="C", strike_id=None, strike_idx=None):
+        """
+        Add (or complete) the record of an instrument, returns it
+        """
+        instrument_name = sys.intern(self.timestamp_key(expiry) + str(strike) + "-" + option)
+        with self._lock:
+            instrument = self.instruments.get(instrument_name)
+            if instrument is None:
+                instrument = Instrument(instrument_name, self.spot, expiry, strike, option, strike_id, strike_idx)
+                self.instruments[instrument_name] = instrument
+            else:
+                if strike_id is not None:
+                    instrument.strike_id = strike_id
+                if strike_idx is not None:
+                    instrument.strike_idx = strike_idx
+        return instrument
+
+    def resolve(self, instrument):
+        """
+        Instrument of a name (or the instrument itself), parsed and registered on first sight
+        """
+        if isinstance(instrument, Instrument):
+            return instrument
+        record = self.instruments.get(instrument)
+        if record is not None:
+            return record
+        spot, date, strike, option = instrument.split("-")
+        # options expire at 08:00 UTC
+        year, month, day = 2000 + int(date[-2:]), month_to_int[date[-5:-2]], int(date[:-5])
+        expiry = int(datetime(year, month, day, 8, tzinfo=timezone.utc).timestamp())
+        record = Instrument(sys.intern(instrument), spot, expiry, int(strike), option)
+        with self._lock:
+            return self.instruments.setdefault(record.instrument_name, record)
+
+    def drop_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.instruments = {name: inst for name, inst in self.instruments.items() if inst.expiry > now}
+
+
+_registries = {}
+
+
+def get_instrument_registry(spot):
+    """
+    Registry shared by every agent of spot
+    """
+    registry = _registries.get(spot)
+    if registry is None:
+        registry = _registries.setdefault(spot, Instrument_Registry(spot))
+    return registry
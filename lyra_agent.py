@@ -1,63 +1,27 @@
-import os, sys, json, time
-import requests
+import os, time
 import numpy as np
-from datetime import datetime
+from collections import namedtuple
 import web3
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
-from eth_abi import decode_abi
 from dotenv import load_dotenv
+from chain_snapshot import Chain_Snapshot
+from providers import registry
+from abi_loader import load_abi, load_contract_addresses
+from calldata import get_template
+from decoding import decode_uint256, decode_int256, decode_ints
+from tx_pipeline import Tx_Pipeline
+from lyra_boards import Lyra_Board_Store
+from collateral_cache import Collateral_Cache
+from instrument_registry import get_instrument_registry
 
 load_dotenv()
 
 MAX_UINT = int(web3.constants.MAX_INT, 16)
 unit = 10**18
-path = "/".join(sys.path[0].split("/")[:0])
+# multicall chunk sizing, see Chain_Snapshot.get_chunks
+QUOTE_CALL_GAS = 1_500_000
 
-
-with open(os.path.join(path, "constants/contract_addresses.json"), "r") as jsonFile:
-    contract_addresses = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/lyraquoter_abi.json"), "r") as jsonFile:
-    quoter_abi = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/optionmarket_abi.json"), "r") as jsonFile:
-    optionmarket_abi = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/optionmarket_wrapper_abi.json"), "r") as jsonFile:
-    optionmarket_wrapper_abi = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/multicall_abi.json"), "r") as jsonFile:
-    multicall_abi = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/price_feed_abi.json"), "r") as jsonFile:
-    price_feed_abi = json.load(jsonFile)
-    jsonFile.close()
-
-with open(os.path.join(path, "abis/greek_cache_abi.json"), "r") as jsonFile:
-    greek_cache_abi = json.load(jsonFile)
-    jsonFile.close()
-
-
-str_month = {
-    1: "JAN",
-    2: "FEB",
-    3: "MAR",
-    4: "APR",
-    5: "MAY",
-    6: "JUN",
-    7: "JUL",
-    8: "AUG",
-    9: "SEP",
-    10: "OCT",
-    11: "NOV",
-    12: "DEC",
-}
+# arrays indexed [strike, amount], USD, nan where the quote reverted
+Lyra_Surface = namedtuple("Lyra_Surface", ["strike_ids", "amounts", "buy", "sell", "collateral", "block_number"])
 
 
 class Lyra_Agent:
@@ -65,44 +29,35 @@ class Lyra_Agent:
         self.wallet = config.get("wallet")
         self.private_key = os.getenv("PRIVATE_KEY")
         self.spot = config.get("spot", "ETH")
+        self.instrument_registry = get_instrument_registry(self.spot)
 
-        self.w3_op = Web3(Web3.HTTPProvider(os.getenv("OPTIMISM_RPC_URL")))
-        self.w3_op.middleware_onion.inject(geth_poa_middleware, layer=0)
+        self.w3_op = registry.get_web3("optimism")
         self.endpoint = "https://api.thegraph.com/subgraphs/name/lyra-finance/mainnet"
-        self.boards_query = """
-                            query Boards {
-                                boards(where: { isExpired: false }) {
-                                    boardId,
-                                    expiryTimestamp,
-                                    market {
-                                    name
-                                    },
-                                    strikes {
-                                    strikePrice
-                                    strikeId
-                                    }
-                                }
-                                }
-                            """
 
         # contracts
-        self.multicall_op = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"]["multicall"]["address"], abi=multicall_abi
+        contract_addresses = load_contract_addresses()
+        self.multicall_op = registry.get_contract(
+            "optimism", contract_addresses["optimism"]["multicall"]["address"], load_abi("multicall_abi")
         )
-        self.quoter = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"]["lyra_quoter"]["address"], abi=quoter_abi
+        self.quoter = registry.get_contract(
+            "optimism", contract_addresses["optimism"]["lyra_quoter"]["address"], load_abi("lyraquoter_abi")
         )
-        self.greek_cache = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"]["greek_cache"]["address"], abi=greek_cache_abi
+        self.greek_cache = registry.get_contract(
+            "optimism", contract_addresses["optimism"]["greek_cache"]["address"], load_abi("greek_cache_abi")
         )
-        self.optionmarket = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"][f"optionmarket_{self.spot.lower()}"]["address"], abi=optionmarket_abi
+        self.optionmarket = registry.get_contract(
+            "optimism",
+            contract_addresses["optimism"][f"optionmarket_{self.spot.lower()}"]["address"],
+            load_abi("optionmarket_abi"),
         )
-        self.optionmarket_wrapper = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"]["optionmarket_wrapper"]["address"], abi=optionmarket_wrapper_abi
+        self.price_feed = registry.get_contract(
+            "optimism", contract_addresses["optimism"]["price_feed"]["address"], load_abi("price_feed_abi")
         )
-        self.price_feed = self.w3_op.eth.contract(
-            address=contract_addresses["optimism"]["price_feed"]["address"], abi=price_feed_abi
+        # quotes of one scan are read at one pinned block, see Chain_Snapshot.pin
+        self.snapshot_op = Chain_Snapshot(self.w3_op, self.multicall_op)
+        # optimism chain id
+        self.tx_pipeline_op = Tx_Pipeline(
+            self.w3_op, 10, self.private_key, gas_price_ttl=config.get("gas_price_ttl", 5)
         )
 
         # lyra quotes
@@ -115,12 +70,55 @@ class Lyra_Agent:
         self.short_put_option_type = config.get("short_put_option_type", 4)
         self.liquidation_margin = config.get("liquidation_margin", 1.25)
 
-        # setting up board etc
-        try:
-            self.option_boards = self.build_option_boards_from_query()
-        except:
-            self.live_boards = self.get_live_boards()
-            self.option_boards = self.build_option_boards()
+        # getMinCollateral results, see Collateral_Cache
+        self.collateral_cache = Collateral_Cache(
+            self.greek_cache,
+            self.snapshot_op,
+            spot_tick=config.get("collateral_spot_tick", 10),
+            maxsize=config.get("collateral_cache_size", 4096),
+            prefetch_margin=config.get("collateral_prefetch_margin", 0.2),
+        )
+
+        # live boards, refreshed incrementally by Arbitrager.update
+        self.board_store = Lyra_Board_Store(
+            self.endpoint,
+            "s" + self.spot,
+            self.optionmarket,
+            self.snapshot_op,
+            self.get_strikes,
+            self.get_timestamp_key,
+            page_size=config.get("subgraph_page_size", 1000),
+        )
+        self.refresh_boards()
+
+    @property
+    def option_boards(self):
+        return self.board_store.option_boards
+
+    def refresh_boards(self):
+        """
+        Refresh the live boards and register their instruments
+        """
+        option_boards = self.board_store.refresh()
+        self.instrument_registry.drop_expired()
+        for option_board in option_boards.values():
+            expiry = option_board["expiry_timestamp"]
+            for strike_id, strike in zip(option_board["strike_ids"], option_board["strikes"]):
+                self.instrument_registry.register(expiry, strike, "C", strike_id=strike_id)
+                self.instrument_registry.register(expiry, strike, "P", strike_id=strike_id)
+        return option_boards
+
+    @property
+    def optionmarket_wrapper(self):
+        """
+        Not used by the bot, built (with its full ABI) on first access only
+        """
+        contract_addresses = load_contract_addresses()
+        return registry.get_contract(
+            "optimism",
+            contract_addresses["optimism"]["optionmarket_wrapper"]["address"],
+            load_abi("optionmarket_wrapper_abi"),
+        )
 
     def get_mid_lyra(self, strike_id):
         """
@@ -128,17 +126,15 @@ class Lyra_Agent:
         TODO: should be adjusted for fees
         """
         unit = 10**18
+        quote = get_template(self.quoter, "quote")
         calldatas = [
-            self.quoter.functions.quote(
-                self.optionmarket.address, strike_id, self.iterations, option_type, unit
-            )._encode_transaction_data()
+            quote.encode(self.optionmarket.address, strike_id, self.iterations, option_type, unit)
             for option_type in [0, 2]
         ]
-        calls = [{"target": self.quoter.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall_op.functions.aggregate(calls).call()
-        decoded_rets = [self.decode(x) for x in rets[1]]
-        premiums = [x[0] / 1e18 for x in decoded_rets]
-        mid = (sum(premiums)) / 2
+        calls = [{"target": self.quoter.address, "callData": cd, "gas": QUOTE_CALL_GAS} for cd in calldatas]
+        rets = self.snapshot_op.aggregate(calls)
+        premiums = decode_uint256(rets[1], scale=1e18)
+        mid = float(premiums.sum()) / 2
         return mid
 
     def get_calls(self, strike_id, amounts, option_type):
@@ -147,16 +143,15 @@ class Lyra_Agent:
         NOTE: First call to quert sUSD/USD price from Chainlink, rest of call to get Lyra quotes
         """
         amounts = [int(amount * 1e18) for amount in amounts]
-        susd_calldata = self.price_feed.functions.latestRoundData()._encode_transaction_data()
+        susd_calldata = get_template(self.price_feed, "latestRoundData").encode()
+        quote = get_template(self.quoter, "quote")
         calldatas = [
-            self.quoter.functions.quote(
-                self.optionmarket.address, strike_id, self.iterations, option_type, amount
-            )._encode_transaction_data()
+            quote.encode(self.optionmarket.address, strike_id, self.iterations, option_type, amount)
             for amount in amounts
         ]
 
         calls = [{"target": self.price_feed.address, "callData": susd_calldata}] + [
-            {"target": self.quoter.address, "callData": cd} for cd in calldatas
+            {"target": self.quoter.address, "callData": cd, "gas": QUOTE_CALL_GAS} for cd in calldatas
         ]
         return calls
 
@@ -176,11 +171,10 @@ class Lyra_Agent:
             raise ValueError("direction must be long or short")
 
         calls = self.get_calls(strike_id, amounts, option_type)
-        rets = self.multicall_op.functions.aggregate(calls).call()
+        rets = self.snapshot_op.aggregate(calls)
         susd_price = self.decode_susd_price(rets[1][0])
-        decoded_rets = [self.decode(x) for x in rets[1][1:]]
-        premiums = [susd_price * x[0] / 1e18 for x in decoded_rets]
-        return premiums
+        premiums = susd_price * decode_uint256(rets[1][1:], scale=1e18)
+        return premiums.tolist()
 
     def get_batch_calls(self, instruments, amount=1):
         """
@@ -189,40 +183,122 @@ class Lyra_Agent:
         NOTE: Rest of calls are organized like [buy_quote_1, sell_quote_1, buy_quote_2, sell_quote_2 ....., buy_quote_n, sell_quote_n]
         """
         amount = 10**18 * amount
-        susd_calldata = self.price_feed.functions.latestRoundData()._encode_transaction_data()
+        susd_calldata = get_template(self.price_feed, "latestRoundData").encode()
+        quote = get_template(self.quoter, "quote")
         calldatas = []
         for instrument in instruments:
-            option_type = "call" if instrument["instrument_name"].endswith("C") else "put"
-            buy_option_type = 0 if option_type == "call" else 1
-            sell_option_type = 2 if option_type == "call" else 4
-            buy_calldata = self.quoter.functions.quote(
-                self.optionmarket.address, instrument["strike_id"], self.iterations, buy_option_type, amount
-            )._encode_transaction_data()
-            sell_calldata = self.quoter.functions.quote(
-                self.optionmarket.address, instrument["strike_id"], self.iterations, sell_option_type, amount
-            )._encode_transaction_data()
+            instrument = self.instrument_registry.resolve(instrument)
+            buy_option_type = 0 if instrument.option == "C" else 1
+            sell_option_type = 2 if instrument.option == "C" else 4
+            buy_calldata = quote.encode(
+                self.optionmarket.address, instrument.strike_id, self.iterations, buy_option_type, amount
+            )
+            sell_calldata = quote.encode(
+                self.optionmarket.address, instrument.strike_id, self.iterations, sell_option_type, amount
+            )
             calldatas += [buy_calldata, sell_calldata]
 
         calls = [{"target": self.price_feed.address, "callData": susd_calldata}] + [
-            {"target": self.quoter.address, "callData": cd} for cd in calldatas
+            {"target": self.quoter.address, "callData": cd, "gas": QUOTE_CALL_GAS} for cd in calldatas
         ]
         return calls
 
     def get_batch_quotes(self, instruments, amount=1):
         """
-        Return quotes for instruments by appending `buy_quote_lyra` and `sell_quote_lyra` to the instruments dict
+        Return {instrument_name: {"buy_quote_lyra": .., "sell_quote_lyra": ..}} for instruments (names or records)
         """
         calls = self.get_batch_calls(instruments, amount)
-        rets = self.multicall_op.functions.aggregate(calls).call()
+        rets = self.snapshot_op.aggregate(calls)
         susd_price = self.decode_susd_price(rets[1][0])
-        decoded_rets = [self.decode(x) for x in rets[1][1:]]
-        premiums = [susd_price * x[0] / 1e18 for x in decoded_rets]
-        j = 0
-        for i in range(len(instruments)):
-            instruments[i]["buy_quote_lyra"] = premiums[j]
-            instruments[i]["sell_quote_lyra"] = premiums[j + 1]
-            j += 2
-        return instruments
+        premiums = (susd_price * decode_uint256(rets[1][1:], scale=1e18)).tolist()
+        quotes = {}
+        for i, instrument in enumerate(instruments):
+            instrument = self.instrument_registry.resolve(instrument)
+            quotes[instrument.instrument_name] = {
+                "buy_quote_lyra": premiums[2 * i],
+                "sell_quote_lyra": premiums[2 * i + 1],
+            }
+        return quotes
+
+    def get_quote_surface(self, strike_ids, amounts, option="call", collateral=False, index_price=None):
+        """
+        Buy and sell premiums of every (strike_id, amount), and with collateral=True the min
+        collateral of the short, from one (chunked) multicall
+        Output: Lyra_Surface, strike_ids/amounts give the row/column of each quote
+        """
+        if collateral and index_price is None:
+            raise Exception("index_price is required to quote collaterals")
+        if option == "call":
+            buy_option_type, sell_option_type = self.long_call_option_type, self.short_call_option_type
+        else:
+            buy_option_type, sell_option_type = self.long_put_option_type, self.short_put_option_type
+        amounts_wei = [int(amount * 1e18) for amount in amounts]
+
+        quote = get_template(self.quoter, "quote")
+        susd_calldata = get_template(self.price_feed, "latestRoundData").encode()
+        calls = [{"target": self.price_feed.address, "callData": susd_calldata}]
+        for option_type in (buy_option_type, sell_option_type):
+            calls += [
+                {
+                    "target": self.quoter.address,
+                    "callData": quote.encode(
+                        self.optionmarket.address, strike_id, self.iterations, option_type, amount
+                    ),
+                    "gas": QUOTE_CALL_GAS,
+                }
+                for strike_id in strike_ids
+                for amount in amounts_wei
+            ]
+        block_number, rets = self.snapshot_op.aggregate(calls)
+        susd_price = self.decode_susd_price(rets[0])
+        values = susd_price * decode_uint256(rets[1:], scale=1e18)
+        shape = (len(strike_ids), len(amounts))
+        size = shape[0] * shape[1]
+        return Lyra_Surface(
+            strike_ids=list(strike_ids),
+            amounts=list(amounts),
+            buy=values[:size].reshape(shape),
+            sell=values[size : 2 * size].reshape(shape),
+            collateral=(
+                susd_price * self.get_surface_collaterals(strike_ids, amounts, option, index_price)
+                if collateral
+                else None
+            ),
+            block_number=block_number,
+        )
+
+    def get_surface_collaterals(self, strike_ids, amounts, option, index_price):
+        """
+        Min collateral (sUSD) of the short of every (strike_id, amount), array indexed [strike, amount]
+        """
+        option_type = self._get_option_type(option, direction="short")
+        spot_price = self.get_shocked_spot(option, index_price)
+        strikes = self.get_strikes_and_expiries()
+        requests = [
+            (option_type, *strikes[strike_id], spot_price, amount) for strike_id in strike_ids for amount in amounts
+        ]
+        values = self.collateral_cache.get_many(requests)
+        # spot close to a bucket edge: the next bucket of every live strike is read in the background
+        self.collateral_cache.prefetch(option_type, spot_price, strikes.values(), amounts)
+        return np.array(values, dtype=float).reshape(len(strike_ids), len(amounts))
+
+    def get_shocked_spot(self, option, index_price):
+        """
+        Spot price the min collateral is computed at
+        """
+        if option == "call":
+            return index_price * self.liquidation_margin
+        return index_price / self.liquidation_margin
+
+    def get_strikes_and_expiries(self):
+        """
+        strike_id -> (strike, expiry timestamp) of the live boards
+        """
+        strikes = {}
+        for option_board in self.option_boards.values():
+            for strike_id, strike in zip(option_board["strike_ids"], option_board["strikes"]):
+                strikes[strike_id] = (strike, option_board["expiry_timestamp"])
+        return strikes
 
     def get_lyra_quote(self, strike_id, amount, direction):
         """
@@ -238,53 +314,35 @@ class Lyra_Agent:
         amount = int(amount * 1e18)
         quote = self.quoter.functions.quote(
             self.optionmarket.address, strike_id, self.iterations, option_type, amount
-        ).call()
+        ).call(block_identifier=self.snapshot_op.block_identifier)
 
         premium = quote[0] / 1e18
         return premium
 
-    def get_collaterals_calls(self, instruments, index_price, amount=1):
-        amount = int(amount * 1e18)
-        susd_calldata = self.price_feed.functions.latestRoundData()._encode_transaction_data()
-        calldatas = []
-
+    def get_required_collaterals(self, instruments, index_price, amount=1):
+        """
+        Min collateral (USD) of shorting amount of each instrument, served from the collateral cache
+        """
+        requests = []
         for instrument in instruments:
-            instrument_name = instrument["instrument_name"]
-            option = "call" if instrument_name.endswith("C") else "put"
-            option_type = self._get_option_type(option, direction="short")
-            strike = self.get_strike_from_name(instrument_name)
-            strike = int(strike * 1e18)
-            expiry = self.get_expiry_from_name(instrument_name)
-            spot_price = (
-                index_price * self.liquidation_margin if option == "call" else index_price / self.liquidation_margin
+            instrument = self.instrument_registry.resolve(instrument)
+            option = "call" if instrument.option == "C" else "put"
+            requests.append(
+                (
+                    self._get_option_type(option, direction="short"),
+                    instrument.strike,
+                    instrument.expiry,
+                    self.get_shocked_spot(option, index_price),
+                    amount,
+                )
             )
-            spot_price = int(spot_price * 1e18)
-            calldata = self.greek_cache.functions.getMinCollateral(
-                option_type, strike, expiry, spot_price, amount
-            )._encode_transaction_data()
-            calldatas.append(calldata)
-
-        calls = [{"target": self.price_feed.address, "callData": susd_calldata}] + [
-            {"target": self.greek_cache.address, "callData": cd} for cd in calldatas
-        ]
-        return calls
-
-    def get_required_collaterals(self, instruments, index_price, amount=1):
-        calls = self.get_collaterals_calls(instruments, index_price, amount)
-        rets = self.multicall_op.functions.aggregate(calls).call()
-        susd_price = self.decode_susd_price(rets[1][0])
-        requiered_collaterals = [susd_price * int(x.hex(), 16) / 1e18 for x in rets[1][1:]]
+        susd_price = self.get_susd_price()
+        requiered_collaterals = (susd_price * np.array(self.collateral_cache.get_many(requests))).tolist()
         return requiered_collaterals
 
     def get_min_collateral(self, option, direction, strike, expiry, spot_price, amount):
         option_type = self._get_option_type(option, direction)
-        strike = int(strike * 10**18)
-        spot_price = int(spot_price * 10**18)
-        amount = int(amount * 10**18)
-        min_collateral = self.greek_cache.functions.getMinCollateral(
-            option_type, strike, expiry, spot_price, amount
-        ).call()
-        return min_collateral / 1e18
+        return self.collateral_cache.get(option_type, strike, expiry, spot_price, amount)
 
     @staticmethod
     def _get_option_type(option, direction):
@@ -301,13 +359,12 @@ class Lyra_Agent:
             else:
                 return 4
 
-    @staticmethod
-    def decode(return_data):
-        return decode_abi(["uint256", "uint256"], return_data)
-
     @staticmethod
     def decode_susd_price(return_data):
-        return decode_abi(["uint80", "int256", "uint256", "uint256", "uint80"], return_data)[1] / 1e8
+        """
+        answer of a Chainlink latestRoundData (uint80, int256, uint256, uint256, uint80) return
+        """
+        return float(decode_int256([return_data], word=1, scale=1e8)[0])
 
     def get_live_boards(self):
         """'
@@ -315,84 +372,15 @@ class Lyra_Agent:
         """
         return sorted(self.optionmarket.functions.getLiveBoards().call())
 
-    def build_option_boards(self):
-        """
-        Build option boards and adding Deribit naming standard
-        """
-        boards = self.live_boards
-        option_boards = {}
-        for board_id in boards:
-            option_board = self.build_option_board(board_id)
-            option_boards.update(option_board)
-        return option_boards
-
-    def build_option_board(self, board_id):
-        """
-        Build one option board
-        """
-        option_board = self.optionmarket.functions.getOptionBoard(board_id).call()
-        expiry_timestamp = option_board[1]
-        timestamp_key = self.get_timestamp_key(expiry_timestamp)
-        strike_ids = option_board[-1]
-        strikes = self.get_strikes(strike_ids)
-        calls = [timestamp_key + str(strike) + "-C" for strike in strikes]
-        puts = [timestamp_key + str(strike) + "-P" for strike in strikes]
-        board = {
-            timestamp_key: {
-                "expiry_timestamp": expiry_timestamp,
-                "strike_ids": strike_ids,
-                "strikes": strikes,
-                "calls": calls,
-                "puts": puts,
-            }
-        }
-        return board
-
-    def build_option_boards_from_query(self):
-        query_result = self.run_query(self.boards_query, self.endpoint)
-        option_boards = {}
-        data = query_result["data"]
-        boards = data["boards"]
-        for board in boards:
-            if board["market"]["name"] == "s" + self.spot:
-                board = self.build_option_board_from_query(board)
-                option_boards.update(board)
-
-        return option_boards
-
-    def build_option_board_from_query(self, board):
-        expiry_timestamp = board["expiryTimestamp"]
-        timestamp_key = self.get_timestamp_key(expiry_timestamp)
-        strike_ids = [int(strike["strikeId"]) for strike in board["strikes"]]
-        strikes = [int(int(strike["strikePrice"]) / 1e18) for strike in board["strikes"]]
-        calls = [timestamp_key + str(strike) + "-C" for strike in strikes]
-        puts = [timestamp_key + str(strike) + "-P" for strike in strikes]
-        board = {
-            timestamp_key: {
-                "expiry_timestamp": expiry_timestamp,
-                "strike_ids": strike_ids,
-                "strikes": strikes,
-                "calls": calls,
-                "puts": puts,
-            }
-        }
-        return board
-
-    # function to use requests.post to make an API call to the subgraph url
-    def run_query(self, query, endpoint):
-
-        # endpoint where you are making the request
-        request = requests.post(endpoint, json={"query": query})
-        if request.status_code == 200:
-            return request.json()
-        else:
-            raise Exception("Query failed. return code is {}.      {}".format(request.status_code, query))
-
     #########################
     ######## Trading #######
     #########################
 
-    def sell_call(self, instrument_name, order_size, required_collateral):
+    def sell_call(self, instrument_name, order_size, required_collateral, wait=True):
+        """
+        Sell order_size calls collateralized with required_collateral sETH, returns the receipt
+        or, with wait=False, a future of the receipt
+        """
         strike_id = self.get_strike_id_from_name(instrument_name)
         amount = int(10**18 * order_size)
         trade_params = {
@@ -401,79 +389,61 @@ class Lyra_Agent:
             "iterations": self.iterations,
             "optionType": 2,
             "amount": amount,
-            "setCollateralTo": required_collateral,
+            "setCollateralTo": int(10**18 * required_collateral),
             "minTotalCost": 0,
             "maxTotalCost": MAX_UINT,
         }
 
-        w3 = self.w3_op
-        sell_tx = self.optionmarket.functions.openPostion(trade_params).buildTransaction(
-            {
-                "chainId": 10,  # arbitrum chain id
-                "gasPrice": w3.eth.gas_price,
-                "from": self.wallet,
-                "nonce": w3.eth.getTransactionCount(self.wallet),
-            }
-        )
-        signed_sell_tx = w3.eth.account.sign_transaction(sell_tx, private_key=self.private_key)
-        sell_tx_hash = w3.eth.send_raw_transaction(signed_sell_tx.rawTransaction)
+        open_position = self.optionmarket.functions.openPosition(trade_params)
+        sell_tx_hash, tx_receipt = self.tx_pipeline_op.submit(open_position, self.wallet)
         print(f"transaction link: https://optimistic.etherscan.io/tx/{sell_tx_hash.hex()}")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(sell_tx_hash)
+        if wait:
+            return tx_receipt.result()
         return tx_receipt
 
     #########################
     ######## Utilities #######
     #########################
     def get_timestamp_key(self, timestamp):
-        date = datetime.fromtimestamp(timestamp)
-        year = str(date.year)
-        month = str_month[date.month]
-        day = str(date.day)
-        return self.spot + "-" + day + month + year[-2:] + "-"
+        return self.instrument_registry.timestamp_key(timestamp)
 
     def get_strikes(self, strike_ids):
-        calldatas = [
-            self.optionmarket.functions.getStrikeAndExpiry(strike_id)._encode_transaction_data()
-            for strike_id in strike_ids
-        ]
+        get_strike_and_expiry = get_template(self.optionmarket, "getStrikeAndExpiry")
+        calldatas = [get_strike_and_expiry.encode(strike_id) for strike_id in strike_ids]
         calls = [{"target": self.optionmarket.address, "callData": cd} for cd in calldatas]
-        rets = self.multicall_op.functions.aggregate(calls).call()
-        decoded_rets = [self.decode(x) for x in rets[1]]
-        strikes = [int(x[0] / 1e18) for x in decoded_rets]
+        rets = self.snapshot_op.aggregate(calls)
+        strikes = decode_ints(rets[1])
+        if None in strikes:
+            raise Exception("getStrikeAndExpiry failed for some Lyra strikes")
+        strikes = [strike // 10**18 for strike in strikes]
         return strikes
 
     def get_susd_price(self):
-        susd_price = (self.price_feed.functions.latestRoundData().call())[1]
-        return susd_price / 1e8
+        susd_calldata = get_template(self.price_feed, "latestRoundData").encode()
+        calls = [{"target": self.price_feed.address, "callData": susd_calldata}]
+        return self.decode_susd_price(self.snapshot_op.aggregate(calls)[1][0])
 
-    @staticmethod
-    def get_strike_from_name(instrument_name):
+    def get_strike_from_name(self, instrument_name):
         """
         e.g INPUT = "ETH-2SEP22-800-C" -> OUTPUT = 800
         """
-        strike = int(instrument_name.split("-")[-2])
-        return strike
+        return self.instrument_registry.resolve(instrument_name).strike
 
     def get_strike_id_from_name(self, instrument_name):
         """
         e.g INPUT = "ETH-2SEP22-800-C" -> OUTPUT = Lyra strike id
         """
-        spot_and_expiry = "-".join(instrument_name.split("-")[:-2]) + "-"
-        strike = self.get_strike_from_name(instrument_name)
-        option_board = self.option_boards[spot_and_expiry]
-        strikes = option_board["strikes"]
-        index = strikes.index(strike)
-        strike_id = option_board["strike_ids"][index]
+        strike_id = self.instrument_registry.resolve(instrument_name).strike_id
+        if strike_id is None:
+            raise Exception(f"{instrument_name} is not listed on Lyra")
         return strike_id
 
     def get_expiry_from_name(self, instrument_name):
-        spot_and_expiry = "-".join(instrument_name.split("-")[:-2]) + "-"
-        option_board = self.option_boards[spot_and_expiry]
-        return option_board["expiry_timestamp"]
+        return self.instrument_registry.resolve(instrument_name).expiry
 
 
 config = {"wallet": "0x"}
-agent = Lyra_Agent(config)
+# agent = Lyra_Agent(config)
 
 instruments = [
     {"instrument_name": "ETH-21OCT22-1300-C", "strike": 1300, "strike_id": 239, "strike_idx": 0},
@@ -0,0 +1,141 @@
+import time
+import threading
+import requests
+from eth_abi import decode_abi
+from calldata import get_template
+
+STRIKES_QUERY = """
+query Strikes($market: String!, $after: BigInt!, $first: Int!) {
+    strikes(
+        first: $first,
+        orderBy: strikeId,
+        orderDirection: asc,
+        where: { market_: { name: $market }, strikeId_gt: $after, isExpired: false }
+    ) {
+        strikeId
+        strikePrice
+        board {
+            boardId
+            expiryTimestamp
+        }
+    }
+}
+"""
+OPTION_BOARD_TYPE = "(uint256,uint256,uint256,bool,uint256[])"  # id, expiry, iv, frozen, strikeIds
+
+
+class Lyra_Board_Store:
+    """
+    Live boards of one Lyra market, in the `option_boards` shape keyed by Deribit expiry prefix
+
+    The first refresh pages through every live strike of the subgraph, later refreshes only
+    ask for strikes past the last seen strikeId (new strikes and new boards alike) and drop
+    expired boards locally. When the subgraph is down, the on-chain fallback reads every live
+    board in one multicall and only the strikes it does not know yet.
+    """
+
+    def __init__(self, endpoint, market_name, optionmarket, snapshot, get_strikes, timestamp_key, page_size=1000):
+        self.endpoint = endpoint
+        self.market_name = market_name
+        self.optionmarket = optionmarket
+        self.snapshot = snapshot
+        self.get_strikes = get_strikes  # strike ids -> strike prices, see Lyra_Agent.get_strikes
+        self.timestamp_key = timestamp_key  # expiry timestamp -> "ETH-21OCT22-"
+        self.page_size = page_size
+        self.session = requests.Session()
+
+        self.boards = {}  # board_id -> {"expiry_timestamp": .., "strikes": {strike_id: strike}}
+        self.option_boards = {}
+        self.last_strike_id = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Fetch boards and strikes listed since the last refresh, returns option_boards
+        """
+        with self._lock:
+            self.drop_expired()
+            try:
+                changed = self._refresh_from_subgraph()
+            except Exception as e:
+                print(f"Lyra subgraph refresh failed, reading boards on-chain: {e}")
+                changed = self._refresh_from_chain()
+            if changed or not self.option_boards:
+                self.option_boards = self._build_option_boards()
+            return self.option_boards
+
+    def drop_expired(self, now=None):
+        now = time.time() if now is None else now
+        expired = [board_id for board_id, board in self.boards.items() if board["expiry_timestamp"] <= now]
+        for board_id in expired:
+            del self.boards[board_id]
+        if expired:
+            self.option_boards = self._build_option_boards()
+
+    def _refresh_from_subgraph(self):
+        changed = False
+        while True:
+            variables = {"market": self.market_name, "after": str(self.last_strike_id), "first": self.page_size}
+            response = self.session.post(self.endpoint, json={"query": STRIKES_QUERY, "variables": variables})
+            if response.status_code != 200:
+                raise Exception(f"Query failed. return code is {response.status_code}")
+            result = response.json()
+            if "errors" in result:
+                raise Exception(f"Query failed. {result['errors']}")
+
+            strikes = result["data"]["strikes"]
+            for strike in strikes:
+                board = strike["board"]
+                self._add_strike(
+                    int(board["boardId"]),
+                    int(board["expiryTimestamp"]),
+                    int(strike["strikeId"]),
+                    int(strike["strikePrice"]) // 10**18,
+                )
+                changed = True
+            if len(strikes) < self.page_size:
+                return changed
+
+    def _refresh_from_chain(self):
+        live_boards = self.optionmarket.functions.getLiveBoards().call(
+            block_identifier=self.snapshot.block_identifier
+        )
+        get_option_board = get_template(self.optionmarket, "getOptionBoard")
+        calls = [{"target": self.optionmarket.address, "callData": get_option_board.encode(b)} for b in live_boards]
+        rets = self.snapshot.aggregate(calls)[1] if calls else []
+
+        now = time.time()
+        new_strikes = []
+        for ret in rets:
+            if ret is None:
+                continue
+            board_id, expiry, _, _, strike_ids = decode_abi([OPTION_BOARD_TYPE], ret)[0]
+            if expiry <= now:
+                continue
+            known = self.boards.get(board_id, {}).get("strikes", {})
+            new_strikes += [(board_id, expiry, strike_id) for strike_id in strike_ids if strike_id not in known]
+
+        if new_strikes:
+            strikes = self.get_strikes([strike_id for _, _, strike_id in new_strikes])
+            for (board_id, expiry, strike_id), strike in zip(new_strikes, strikes):
+                self._add_strike(board_id, expiry, strike_id, strike)
+        return bool(new_strikes)
+
+    def _add_strike(self, board_id, expiry_timestamp, strike_id, strike):
+        board = self.boards.setdefault(board_id, {"expiry_timestamp": expiry_timestamp, "strikes": {}})
+        board["strikes"][strike_id] = strike
+        self.last_strike_id = max(self.last_strike_id, strike_id)
+
+    def _build_option_boards(self):
+        option_boards = {}
+        for board in self.boards.values():
+            timestamp_key = self.timestamp_key(board["expiry_timestamp"])
+            strike_ids, strikes = zip(*sorted(board["strikes"].items(), key=lambda item: item[1]))
+            option_boards[timestamp_key] = {
+                "expiry_timestamp": board["expiry_timestamp"],
+                "strike_ids": list(strike_ids),
+                "strikes": list(strikes),
+                "calls": [timestamp_key + str(strike) + "-C" for strike in strikes],
+                "puts": [timestamp_key + str(strike) + "-P" for strike in strikes],
+            }
+        return option_boards
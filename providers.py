@@ -0,0 +1,77 @@
+import os, threading
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+from dotenv import load_dotenv
+from abi_loader import load_abi, load_contract_addresses
+from calldata import get_template
+from decoding import decode_uint256
+
+load_dotenv()
+
+
+class Provider_Registry:
+    """
+    One Web3 per network over a keep-alive HTTP session, plus cached contract objects
+    Nothing is created (and nothing hits the network) until a network is first used
+    """
+
+    def __init__(self, pool_size=10):
+        self.pool_size = pool_size
+        self._web3s = {}
+        self._contracts = {}
+        self._lock = threading.Lock()
+
+    def get_web3(self, network):
+        network = network.lower()
+        with self._lock:
+            w3 = self._web3s.get(network)
+            if w3 is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                w3 = Web3(Web3.HTTPProvider(os.getenv(f"{network.upper()}_RPC_URL"), session=session))
+                w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+                self._web3s[network] = w3
+        return w3
+
+    def get_contract(self, network, address, abi):
+        network = network.lower()
+        key = (network, address)
+        contract = self._contracts.get(key)
+        if contract is None:
+            contract = self.get_web3(network).eth.contract(address=address, abi=abi)
+            self._contracts[key] = contract
+        return contract
+
+    def get_token_balances(self, wallet, tokens, network="arbitrum"):
+        """
+        Output: {token: balance} for tokens of contract_addresses.json, read in one multicall
+        """
+        network = network.lower()
+        contract_addresses = self.contract_addresses()
+        multicall = self.get_contract(
+            network, contract_addresses[network]["multicall"]["address"], self.load_abi("multicall_abi")
+        )
+        calls = []
+        for token in tokens:
+            token_contract = self.get_contract(
+                network, contract_addresses[network][token]["address"], self.load_abi("erc20_abi")
+            )
+            calldata = get_template(token_contract, "balanceOf").encode(wallet)
+            calls.append({"target": token_contract.address, "callData": calldata})
+        rets = multicall.functions.aggregate(calls).call()[1]
+        scales = [10 ** contract_addresses[network][token]["decimals"] for token in tokens]
+        balances = decode_uint256(rets) / scales
+        return dict(zip(tokens, balances.tolist()))
+
+    def contract_addresses(self):
+        return load_contract_addresses()
+
+    def load_abi(self, name):
+        return load_abi(name)
+
+
+registry = Provider_Registry()
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+
+class Credit_Bucket:
+    """
+    Async token bucket mirroring Deribit's credit based rate limits
+    `rate` requests per second sustained, up to `burst` requests at once
+
+    NOTE: meant to be used from a single event loop (the Deribit session loop)
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def configure(self, rate, burst):
+        """
+        Apply limits read from the account, keeps the tokens already spent
+        """
+        self._refill(time.monotonic())
+        self.rate = rate
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+
+    async def acquire(self, cost=1):
+        """
+        Wait until `cost` tokens are available and take them
+        """
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens >= cost:
+                self.tokens -= cost
+                return
+            wait = max(self.blocked_until - now, (cost - self.tokens) / self.rate)
+            await asyncio.sleep(wait)
+
+    def back_off(self, delay):
+        """
+        Empty the bucket and block it for `delay` seconds, used on `too_many_requests`
+        """
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
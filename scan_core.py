@@ -0,0 +1,232 @@
+import numpy as np
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+ONEYEAR = timedelta(days=365).total_seconds()
+
+SCAN_DTYPE = np.dtype(
+    [
+        ("row", np.int32),  # position of the instrument in Scan_Core.names
+        ("buy_venue", np.int8),  # position in Scan_Core.venue_names, -1 without venues
+        ("sell_venue", np.int8),
+        ("buy_block", np.int64),  # block the buy leg was quoted at, -1 off chain
+        ("sell_block", np.int64),
+        ("expiry", np.int64),
+        ("strike", np.float64),
+        ("amount", np.float64),
+        ("buy", np.float64),  # USD, whole order
+        ("sell", np.float64),  # USD, whole order
+        ("gas", np.float64),  # USD
+        ("collateral", np.float64),  # USD locked by the sell leg until expiry, whole order
+        ("pnl", np.float64),  # USD
+        ("apr", np.float64),  # % of the collateral
+    ]
+)
+
+Scan_Candidate = namedtuple(
+    "Scan_Candidate",
+    [
+        "instrument_name",
+        "expiry",
+        "strike",
+        "amount",
+        "buy",
+        "sell",
+        "gas",
+        "collateral",
+        "pnl",
+        "apr",
+        "buy_venue",
+        "sell_venue",
+        "buy_block",
+        "sell_block",
+    ],
+)
+
+
+class Scan_Core:
+    """
+    Columnar PNL/APR evaluation of an instrument x order size grid
+
+    Rows live in one structured array reused across scans (grown, never shrunk); PNL and APR are
+    computed in place for the whole grid and the best candidate is picked with argmax, no
+    DataFrame is built unless `to_frame` is called for display.
+    """
+
+    def __init__(self, margin=1.25, capacity=256):
+        self.margin = margin
+        self.names = []
+        self.venue_names = None
+        self.size = 0
+        self._buffer = np.zeros(capacity, dtype=SCAN_DTYPE)
+        self._mask = np.zeros(capacity, dtype=bool)
+        self._apr_mask = np.zeros(capacity, dtype=bool)
+        self._scores = np.zeros(capacity, dtype=np.float64)
+
+    @property
+    def result(self):
+        """
+        Rows of the last scan, a view on the reused buffer
+        """
+        return self._buffer[: self.size]
+
+    def evaluate(
+        self,
+        names,
+        strikes,
+        expiries,
+        amounts,
+        buy,
+        sell,
+        gas,
+        now,
+        buy_venues=None,
+        sell_venues=None,
+        venue_names=None,
+        collateral=None,
+        buy_blocks=None,
+        sell_blocks=None,
+    ):
+        """
+        names/strikes/expiries: one per instrument, amounts: order sizes
+        buy/sell: USD arrays (len(names), len(amounts)) for the whole order, gas: USD scalar or per instrument
+        buy_venues/sell_venues: per instrument position of the venue legs in venue_names, if any
+        collateral: USD array like buy/sell the sell leg locks, margin x strike x amount where nan or None
+        buy_blocks/sell_blocks: per instrument block each leg was quoted at, -1 off chain
+        Output: rows of the scan, instrument-major (row i * len(amounts) + j is names[i] at amounts[j])
+        """
+        n, m = len(names), len(amounts)
+        self._reserve(n * m)
+        self.names = names
+        self.venue_names = venue_names
+        self.size = n * m
+        result = self.result
+
+        grid = (n, m)
+        strikes = np.asarray(strikes, dtype=np.float64)
+        expiries = np.asarray(expiries, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        result["row"].reshape(grid)[:] = np.arange(n)[:, None]
+        result["expiry"].reshape(grid)[:] = expiries[:, None]
+        result["strike"].reshape(grid)[:] = strikes[:, None]
+        result["amount"].reshape(grid)[:] = amounts[None, :]
+        result["buy_venue"].reshape(grid)[:] = -1 if buy_venues is None else np.reshape(buy_venues, (-1, 1))
+        result["sell_venue"].reshape(grid)[:] = -1 if sell_venues is None else np.reshape(sell_venues, (-1, 1))
+        result["buy_block"].reshape(grid)[:] = -1 if buy_blocks is None else np.reshape(buy_blocks, (-1, 1))
+        result["sell_block"].reshape(grid)[:] = -1 if sell_blocks is None else np.reshape(sell_blocks, (-1, 1))
+        result["buy"].reshape(grid)[:] = buy
+        result["sell"].reshape(grid)[:] = sell
+        result["gas"].reshape(grid)[:] = np.reshape(gas, (-1, 1)) if np.ndim(gas) else gas
+
+        pnl = result["pnl"].reshape(grid)
+        np.subtract(result["sell"].reshape(grid), result["buy"].reshape(grid), out=pnl)
+        np.subtract(pnl, result["gas"].reshape(grid), out=pnl)
+
+        locked = result["collateral"].reshape(grid)
+        np.multiply(self.margin * strikes[:, None], amounts[None, :], out=locked)
+        if collateral is not None:
+            collateral = np.asarray(collateral, dtype=np.float64)
+            np.copyto(locked, collateral, where=np.isfinite(collateral))
+
+        # APR of the collateral locked until expiry
+        apr = result["apr"].reshape(grid)
+        annualize = 100 * ONEYEAR / (expiries - now)
+        np.multiply(pnl, annualize[:, None], out=apr)
+        np.divide(apr, locked, out=apr)
+        return result
+
+    def best(self, min_pnl=-np.inf, min_apr=-np.inf):
+        """
+        Scan_Candidate of the highest APR with pnl > min_pnl and apr >= min_apr, None if there is none
+        """
+        if self.size == 0:
+            return None
+        result = self.result
+        mask = self._mask[: self.size]
+        scores = self._scores[: self.size]
+        apr_mask = self._apr_mask[: self.size]
+        np.greater(result["pnl"], min_pnl, out=mask)
+        np.greater_equal(result["apr"], min_apr, out=apr_mask)
+        np.logical_and(mask, apr_mask, out=mask)
+        scores.fill(-np.inf)
+        np.copyto(scores, result["apr"], where=mask)
+        i = int(np.argmax(scores))
+        if not mask[i]:
+            return None
+        return self.candidate(i)
+
+    def candidate(self, i):
+        record = self.result[i]
+        return Scan_Candidate(
+            self.names[record["row"]],
+            int(record["expiry"]),
+            float(record["strike"]),
+            float(record["amount"]),
+            float(record["buy"]),
+            float(record["sell"]),
+            float(record["gas"]),
+            float(record["collateral"]),
+            float(record["pnl"]),
+            float(record["apr"]),
+            self._venue_name(record["buy_venue"]),
+            self._venue_name(record["sell_venue"]),
+            self._block(record["buy_block"]),
+            self._block(record["sell_block"]),
+        )
+
+    def _venue_name(self, venue):
+        if self.venue_names is None or venue < 0:
+            return None
+        return self.venue_names[venue]
+
+    @staticmethod
+    def _block(block):
+        return None if block < 0 else int(block)
+
+    def to_frame(self, instrument_name=None):
+        """
+        Last scan as a rounded DataFrame for display, only the rows of instrument_name if given
+        """
+        import pandas as pd
+
+        result = self.result
+        if instrument_name is not None:
+            rows = [row for row, name in enumerate(self.names) if name == instrument_name]
+            result = result[np.isin(result["row"], rows)]
+        columns = {
+            "Expiry": [datetime.fromtimestamp(expiry, tz=timezone.utc) for expiry in result["expiry"].tolist()],
+            "Strike Price": result["strike"],
+            "instrument_name": [self.names[row] for row in result["row"].tolist()],
+            "Order Sizes": result["amount"],
+            "Buy Prices (USD)": result["buy"],
+            "Sell Prices (USD)": result["sell"],
+            "Gas (USD)": result["gas"],
+            "Collateral (USD)": result["collateral"],
+            "PNL (USD)": result["pnl"],
+            "APR": result["apr"],
+        }
+        if self.venue_names is not None:
+            columns["Buy Venue"] = [self._venue_name(venue) for venue in result["buy_venue"].tolist()]
+            columns["Sell Venue"] = [self._venue_name(venue) for venue in result["sell_venue"].tolist()]
+        columns["Buy Block"] = [self._block(block) for block in result["buy_block"].tolist()]
+        columns["Sell Block"] = [self._block(block) for block in result["sell_block"].tolist()]
+        df = pd.DataFrame(columns)
+        return df.round(
+            {
+                "Buy Prices (USD)": 2,
+                "Sell Prices (USD)": 2,
+                "Gas (USD)": 2,
+                "Collateral (USD)": 2,
+                "PNL (USD)": 2,
+                "APR": 2,
+            }
+        )
+
+    def _reserve(self, size):
+        if size <= len(self._buffer):
+            return
+        capacity = max(size, 2 * len(self._buffer))
+        self._buffer = np.zeros(capacity, dtype=SCAN_DTYPE)
+        self._mask = np.zeros(capacity, dtype=bool)
+        self._apr_mask = np.zeros(capacity, dtype=bool)
+        self._scores = np.zeros(capacity, dtype=np.float64)
@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip("web3")
+
+from web3 import Web3
+from calldata import Calldata_Template, get_template
+
+ADDRESS = "0x0000000000000000000000000000000000000001"
+WALLET = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+ABI = [
+    {
+        "type": "function",
+        "name": "purchase",
+        "inputs": [
+            {"name": "strikeIndex", "type": "uint256"},
+            {"name": "amount", "type": "uint256"},
+            {"name": "to", "type": "address"},
+        ],
+        "outputs": [],
+        "stateMutability": "nonpayable",
+    },
+    {
+        "type": "function",
+        "name": "quote",
+        "inputs": [
+            {"name": "strikeId", "type": "uint256"},
+            {"name": "delta", "type": "int256"},
+            {"name": "isBuy", "type": "bool"},
+            {"name": "key", "type": "bytes32"},
+        ],
+        "outputs": [],
+        "stateMutability": "view",
+    },
+    {
+        "type": "function",
+        "name": "names",
+        "inputs": [{"name": "name", "type": "string"}],
+        "outputs": [],
+        "stateMutability": "view",
+    },
+]
+
+
+@pytest.fixture
+def contract():
+    return Web3().eth.contract(address=ADDRESS, abi=ABI)
+
+
+@pytest.mark.parametrize(
+    "fn_name, args",
+    [
+        ("purchase", (0, 10**18, WALLET)),
+        ("purchase", (3, 2**256 - 1, WALLET.lower())),
+        ("quote", (7, -(10**18), True, b"\x01" * 32)),
+        ("quote", (2**64, 0, False, b"abc")),
+    ],
+)
+def test_template_matches_web3_encoding(contract, fn_name, args):
+    expected = contract.functions[fn_name](*args)._encode_transaction_data()
+    assert get_template(contract, fn_name).encode(*args) == expected
+
+
+def test_buffer_reuse_does_not_leak_arguments(contract):
+    template = get_template(contract, "purchase")
+    first = template.encode(1, 2, WALLET)
+    template.encode(9, 9, ADDRESS)
+    assert template.encode(1, 2, WALLET) == first
+    assert template.encode_many([(1, 2, WALLET), (9, 9, ADDRESS)])[0] == first
+
+
+def test_templates_are_shared_per_signature(contract):
+    other = Web3().eth.contract(address=WALLET, abi=ABI)
+    assert get_template(contract, "purchase") is get_template(other, "purchase")
+
+
+def test_dynamic_types_are_rejected(contract):
+    with pytest.raises(Exception):
+        get_template(contract, "names")
+    with pytest.raises(Exception):
+        Calldata_Template("purchase(uint256,uint256,address)", ("uint256", "uint256", "address")).encode(1, 2)
+
+
+@pytest.mark.parametrize("address", ["0x", "0x1234", WALLET + "00"])
+def test_malformed_address_is_rejected(address):
+    template = Calldata_Template("purchase(uint256,uint256,address)", ("uint256", "uint256", "address"))
+    with pytest.raises(ValueError):
+        template.encode(0, 10**18, address)
+    # the shared buffer keeps its size
+    assert len(template.encode(0, 10**18, WALLET)) == 2 + 2 * (4 + 3 * 32)
+
+
+def test_oversized_fixed_bytes_are_rejected():
+    template = Calldata_Template("quote(uint256,int256,bool,bytes32)", ("uint256", "int256", "bool", "bytes32"))
+    with pytest.raises(ValueError):
+        template.encode(1, 1, True, b"\x01" * 33)
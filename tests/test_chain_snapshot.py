@@ -0,0 +1,123 @@
+import types
+from chain_snapshot import DEFAULT_CALL_GAS, Chain_Snapshot
+
+
+class Fake_Call:
+    def __init__(self, multicall, chunk):
+        self.multicall = multicall
+        self.chunk = chunk
+
+    def call(self, block_identifier="latest"):
+        return self.multicall.run(self.chunk, block_identifier)
+
+
+class Fake_Multicall:
+    """
+    tryBlockAndAggregate returning the calldata as return data, "0xdead" reverts
+    and chunks longer than max_calls are rejected like an oversized eth_call
+    """
+
+    def __init__(self, block_number=100, max_calls=None):
+        self.block_number = block_number
+        self.max_calls = max_calls
+        self.requests = []
+        self.functions = types.SimpleNamespace(tryBlockAndAggregate=self.try_block_and_aggregate)
+
+    def try_block_and_aggregate(self, require_success, chunk):
+        return Fake_Call(self, chunk)
+
+    def run(self, chunk, block_identifier):
+        self.requests.append((block_identifier, [call["callData"] for call in chunk]))
+        if self.max_calls is not None and len(chunk) > self.max_calls:
+            raise Exception("gas limit exceeded")
+        block_number = self.block_number if block_identifier == "latest" else block_identifier
+        results = [(call["callData"] != "0xdead", call["callData"]) for call in chunk]
+        return block_number, b"", results
+
+
+def make_snapshot(multicall, **kwargs):
+    w3 = types.SimpleNamespace(eth=types.SimpleNamespace(block_number=multicall.block_number))
+    return Chain_Snapshot(w3, multicall, **kwargs)
+
+
+def calls(*calldatas, gas=None):
+    if gas is None:
+        return [{"target": "0xabc", "callData": calldata} for calldata in calldatas]
+    return [{"target": "0xabc", "callData": calldata, "gas": gas} for calldata in calldatas]
+
+
+def test_get_chunks_splits_by_estimated_gas():
+    snapshot = make_snapshot(Fake_Multicall(), max_chunk_gas=3 * DEFAULT_CALL_GAS)
+    chunks = snapshot.get_chunks(calls("0x1", "0x2", "0x3", "0x4", "0x5"))
+    assert [len(chunk) for chunk in chunks] == [3, 2]
+    chunks = snapshot.get_chunks(calls("0x1", "0x2") + calls("0x3", gas=10 * DEFAULT_CALL_GAS) + calls("0x4"))
+    assert [len(chunk) for chunk in chunks] == [2, 1, 1]
+    # gas estimates are not sent on chain
+    assert all(set(call) == {"target", "callData"} for chunk in chunks for call in chunk)
+    assert snapshot.get_chunks([]) == []
+
+
+def test_chunks_of_one_aggregate_read_one_block():
+    multicall = Fake_Multicall(block_number=42)
+    snapshot = make_snapshot(multicall, max_chunk_gas=DEFAULT_CALL_GAS)
+    block_number, rets = snapshot.try_aggregate(calls("0x1", "0xdead", "0x3"))
+    assert block_number == 42
+    assert rets == ["0x1", None, "0x3"]
+    assert {block for block, _ in multicall.requests} == {42}
+
+
+def test_rejected_chunk_is_halved():
+    multicall = Fake_Multicall(max_calls=2)
+    snapshot = make_snapshot(multicall)
+    _, rets = snapshot.try_aggregate(calls("0x1", "0x2", "0x3", "0x4", "0x5"))
+    assert rets == ["0x1", "0x2", "0x3", "0x4", "0x5"]
+    # 5 rejected -> 2 + 3, 3 rejected -> 1 + 2
+    assert [len(sent) for _, sent in multicall.requests] == [5, 2, 3, 1, 2]
+
+
+def test_pinned_reads_are_memoized_per_block():
+    multicall = Fake_Multicall(block_number=7)
+    snapshot = make_snapshot(multicall)
+    assert snapshot.pin() == 7
+    assert snapshot.aggregate(calls("0x01", "0xdead")) == [7, ["0x01", None]]
+    assert snapshot.aggregate(calls("0x01", "0x02", "0xDEAD")) == [7, ["0x01", "0x02", None]]
+    # only 0x02 was missing the second time, reverts are cached too
+    assert multicall.requests[1] == (7, ["0x02"])
+    # bytes and hex calldata share a cache entry
+    assert snapshot.aggregate(calls(bytes.fromhex("02"))) == [7, ["0x02"]]
+    assert len(multicall.requests) == 2
+
+    snapshot.pin(8)
+    snapshot.aggregate(calls("0x01"))
+    assert multicall.requests[-1] == (8, ["0x01"])
+
+
+def test_unpinned_reads_are_not_memoized():
+    multicall = Fake_Multicall()
+    snapshot = make_snapshot(multicall)
+    snapshot.aggregate(calls("0x1"))
+    snapshot.aggregate(calls("0x1"))
+    assert [block for block, _ in multicall.requests] == ["latest", "latest"]
+
+
+def test_failed_requests_are_retried_when_pinned(capsys):
+    multicall = Fake_Multicall(max_calls=0)
+    snapshot = make_snapshot(multicall)
+    snapshot.pin()
+    assert snapshot.aggregate(calls("0x1")) == [100, [None]]
+    multicall.max_calls = None
+    assert snapshot.aggregate(calls("0x1")) == [100, ["0x1"]]
+    assert "failed" in capsys.readouterr().out
+
+
+def test_memoization_keys_are_case_insensitive():
+    assert Chain_Snapshot._normalize("0xABcd") == Chain_Snapshot._normalize(bytes.fromhex("abcd"))
+
+
+def test_block_identifier():
+    snapshot = make_snapshot(Fake_Multicall())
+    assert snapshot.block_identifier == "latest"
+    snapshot.pin(5)
+    assert snapshot.block_identifier == 5
+    snapshot.unpin()
+    assert snapshot.block_identifier == "latest"
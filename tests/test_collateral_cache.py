@@ -0,0 +1,89 @@
+import math
+import pytest
+
+pytest.importorskip("web3")
+
+from collateral_cache import Collateral_Cache
+
+SHORT_CALL, SHORT_PUT = 3, 4
+EXPIRY = 1_700_000_000
+
+
+class Fake_Chain_Cache(Collateral_Cache):
+    """
+    Collateral_Cache reading min collaterals from a formula instead of greek_cache
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(None, None, **kwargs)
+        self.reads = []
+
+    def _read(self, keys):
+        self.reads.append(list(keys))
+        return [math.nan if strike < 0 else strike * amount / spot for _, strike, _, spot, amount in keys]
+
+
+def test_buckets_round_to_the_conservative_side():
+    cache = Fake_Chain_Cache(spot_tick=10)
+    assert cache.bucket(SHORT_CALL, 1621) == 1630
+    assert cache.bucket(SHORT_CALL, 1630) == 1630
+    assert cache.bucket(SHORT_PUT, 1629) == 1620
+
+
+def test_hits_are_served_from_the_cache():
+    cache = Fake_Chain_Cache(spot_tick=10)
+    first = cache.get_many([(SHORT_CALL, 1500, EXPIRY, 1621, 1), (SHORT_CALL, 1600, EXPIRY, 1622, 2)])
+    assert first == [1500 / 1630, 2 * 1600 / 1630]
+    # same bucket, only the new key is read
+    assert cache.get_many([(SHORT_CALL, 1500, EXPIRY, 1629, 1), (SHORT_CALL, 1700, EXPIRY, 1625, 1)])[0] == first[0]
+    assert len(cache.reads[1]) == 1
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_request_larger_than_the_cache_mixing_hits_and_misses():
+    cache = Fake_Chain_Cache(spot_tick=10, maxsize=4)
+    cache.get_many([(SHORT_CALL, strike, EXPIRY, 1625, 1) for strike in (1000, 1100)])
+    requests = [(SHORT_CALL, strike, EXPIRY, 1625, 1) for strike in (1000, 1100, 1200, 1300, 1400, 1500)]
+    # storing the 4 misses evicts the 2 hits of the same request
+    assert cache.get_many(requests) == [strike / 1630 for strike in (1000, 1100, 1200, 1300, 1400, 1500)]
+    assert len(cache._values) == 4
+
+
+def test_reverted_calls_are_nan_and_not_cached():
+    cache = Fake_Chain_Cache()
+    assert math.isnan(cache.get(SHORT_CALL, -1, EXPIRY, 1625, 1))
+    assert math.isnan(cache.get(SHORT_CALL, -1, EXPIRY, 1625, 1))
+    assert len(cache.reads) == 2
+
+
+def test_lru_eviction():
+    cache = Fake_Chain_Cache(maxsize=2)
+    cache.get(SHORT_CALL, 1000, EXPIRY, 1625, 1)
+    cache.get(SHORT_CALL, 1100, EXPIRY, 1625, 1)
+    cache.get(SHORT_CALL, 1000, EXPIRY, 1625, 1)
+    cache.get(SHORT_CALL, 1200, EXPIRY, 1625, 1)
+    assert [key[1] for key in cache._values] == [1000, 1200]
+
+
+def test_prefetch_fills_the_next_bucket_near_an_edge():
+    cache = Fake_Chain_Cache(spot_tick=10, prefetch_margin=0.2)
+    strikes = [(1500, EXPIRY), (1600, EXPIRY)]
+    assert cache.prefetch(SHORT_CALL, 1625, strikes, [1, 2]) is None
+    cache.prefetch(SHORT_CALL, 1629, strikes, [1, 2]).result()
+    assert {key[3] for key in cache.reads[0]} == {1640} and len(cache.reads[0]) == 4
+    # already prefetched
+    assert cache.prefetch(SHORT_CALL, 1628.5, strikes, [1, 2]) is None
+    # crossing the edge is a hit
+    cache.get_many([(SHORT_CALL, 1500, EXPIRY, 1631, 1), (SHORT_CALL, 1600, EXPIRY, 1631, 2)])
+    assert len(cache.reads) == 1
+
+    cache.prefetch(SHORT_CALL, 1621, strikes, [1]).result()
+    assert {key[3] for key in cache.reads[1]} == {1620}
+
+
+def test_prefetch_of_puts():
+    cache = Fake_Chain_Cache(spot_tick=10, prefetch_margin=0.2)
+    cache.prefetch(SHORT_PUT, 1621, [(1500, EXPIRY)], [1]).result()
+    assert cache.reads[0][0][3] == 1610
+    cache.prefetch(SHORT_PUT, 1629, [(1500, EXPIRY)], [1]).result()
+    assert cache.reads[1][0][3] == 1630
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from decoding import decode_int256, decode_ints, decode_uint256, get_words
+
+
+def words(*values):
+    return b"".join(value.to_bytes(32, "big", signed=value < 0) for value in values)
+
+
+def test_decode_uint256_scales_and_masks_failed_calls():
+    return_data = [words(2 * 10**18, 7), None, b"\x00" * 16, words(0, 5 * 10**17)]
+    np.testing.assert_array_equal(np.isnan(decode_uint256(return_data, scale=10**18)), [False, True, True, False])
+    np.testing.assert_allclose(decode_uint256(return_data, scale=10**18)[[0, 3]], [2.0, 0.0])
+    values = decode_uint256(return_data, word=1, scale=10**18)
+    assert np.isnan(values[1]) and np.isnan(values[2])
+    np.testing.assert_allclose(values[[0, 3]], [7e-18, 0.5])
+
+
+def test_decode_uint256_large_values():
+    large = 2**255 + 12345 * 2**130
+    assert decode_uint256([words(large)])[0] == pytest.approx(float(large), rel=1e-15)
+
+
+def test_decode_int256_negative_values():
+    return_data = [words(-1), words(-(10**26)), words(10**26), None]
+    values = decode_int256(return_data, scale=10**8)
+    np.testing.assert_allclose(values[:3], [-1e-8, -1e18, 1e18], rtol=1e-15)
+    assert np.isnan(values[3])
+
+
+def test_decode_ints_is_exact():
+    large = 2**200 + 1
+    assert decode_ints([words(1, large), None, words(3)], word=1) == [large, None, None]
+
+
+def test_empty_return_data():
+    assert decode_uint256([]).shape == (0,)
+    assert decode_int256([]).shape == (0,)
+    assert decode_ints([]) == []
+
+
+def test_get_words_shape():
+    buffer, valid = get_words([words(1), None])
+    assert buffer.shape == (2, 32) and buffer.dtype == np.uint8
+    np.testing.assert_array_equal(valid, [True, False])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("dotenv")
+pytest.importorskip("websockets")
+
+from deribit_agent import Deribit_Agent
+
+
+def make_agent(exchange_fee=0.0003, settlement_fee=0.00015):
+    agent = Deribit_Agent.__new__(Deribit_Agent)
+    agent.exchange_fee = exchange_fee
+    agent.settlement_fee = settlement_fee
+    return agent
+
+
+def baseline_avg_price_and_fees(agent, orderbook_side, amount):
+    """
+    Level by level walk of the original implementation, one amount at a time
+    """
+    if len(orderbook_side) == 0:
+        return {"price": np.nan, "trading_fee": 0, "settlement_fee": 0}
+    seen_amount = 0
+    total_paid = 0
+    total_trading_fee = 0
+    total_settlement_fee = 0
+    for price, size in orderbook_side:
+        trading_fee = agent.get_trading_fee(price)
+        settlement_fee = agent.get_settlement_fee(price)
+        if size + seen_amount >= amount:
+            size_diff = amount - seen_amount
+            total_paid += price * size_diff
+            total_trading_fee += trading_fee * size_diff
+            total_settlement_fee += settlement_fee * size_diff
+            return {
+                "price": total_paid / amount,
+                "trading_fee": total_trading_fee / amount,
+                "settlement_fee": total_settlement_fee / amount,
+            }
+        seen_amount += size
+        total_paid += size * price
+        total_trading_fee += size * trading_fee
+        total_settlement_fee += size * settlement_fee
+    return {"price": np.nan, "trading_fee": 0, "settlement_fee": 0}
+
+
+def random_side(rng, n_levels):
+    prices = np.round(np.sort(rng.uniform(0.0005, 0.2, n_levels)), 4)
+    sizes = np.round(rng.uniform(0.1, 20, n_levels), 1)
+    return [[float(price), float(size)] for price, size in zip(prices, sizes)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_baseline_on_random_books(seed):
+    rng = np.random.default_rng(seed)
+    agent = make_agent()
+    side = random_side(rng, int(rng.integers(1, 12)))
+    total = sum(size for _, size in side)
+    amounts = sorted(rng.uniform(0.1, 1.5 * total, 8).tolist()) + [side[0][1], total]
+
+    walked = agent._get_avg_prices_and_fees(side, amounts)
+    for i, amount in enumerate(amounts):
+        expected = baseline_avg_price_and_fees(agent, side, amount)
+        for key in ("price", "trading_fee", "settlement_fee"):
+            np.testing.assert_allclose(walked[key][i], expected[key], rtol=1e-12, equal_nan=True)
+
+
+def test_empty_side_gives_nan_prices():
+    walked = make_agent()._get_avg_prices_and_fees([], [1, 2])
+    assert np.isnan(walked["price"]).all()
+    assert (walked["trading_fee"] == 0).all()
+    assert (walked["settlement_fee"] == 0).all()
+
+
+def test_amount_deeper_than_book_gives_nan():
+    walked = make_agent()._get_avg_prices_and_fees([[0.01, 1.0], [0.02, 1.0]], [1.5, 2.0, 2.5])
+    np.testing.assert_allclose(walked["price"][:2], [(0.01 + 0.5 * 0.02) / 1.5, 0.015])
+    assert np.isnan(walked["price"][2])
+    assert walked["trading_fee"][2] == 0
+
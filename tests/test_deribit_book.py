@@ -0,0 +1,64 @@
+from deribit_book import Local_Order_Book
+
+
+def snapshot(change_id, bids, asks):
+    return {
+        "type": "snapshot",
+        "change_id": change_id,
+        "timestamp": change_id,
+        "bids": [["new", price, amount] for price, amount in bids],
+        "asks": [["new", price, amount] for price, amount in asks],
+    }
+
+
+def change(prev_change_id, change_id, bids=(), asks=()):
+    return {
+        "type": "change",
+        "prev_change_id": prev_change_id,
+        "change_id": change_id,
+        "timestamp": change_id,
+        "bids": list(bids),
+        "asks": list(asks),
+    }
+
+
+def test_snapshot_then_changes():
+    book = Local_Order_Book("ETH-30JUN23-2000-C")
+    assert book.apply(snapshot(1, [(0.01, 5), (0.011, 2)], [(0.012, 3), (0.013, 4)]))
+    assert book.apply(change(1, 2, bids=[["change", 0.011, 7]], asks=[["delete", 0.012, 0]]))
+    assert book.apply(change(2, 3, bids=[["new", 0.0115, 1]]))
+    assert book.synced and book.change_id == 3
+    assert book.levels() == {
+        "bids": [[0.0115, 1], [0.011, 7], [0.01, 5]],
+        "asks": [[0.013, 4]],
+    }
+    assert book.levels(depth=1) == {"bids": [[0.0115, 1]], "asks": [[0.013, 4]]}
+
+
+def test_gap_in_change_id_unsyncs_the_book():
+    book = Local_Order_Book("ETH-30JUN23-2000-C")
+    book.apply(snapshot(1, [(0.01, 5)], [(0.012, 3)]))
+    assert not book.apply(change(2, 3, bids=[["change", 0.01, 1]]))
+    assert not book.synced
+    # the gapped change is not applied
+    assert book.levels()["bids"] == [[0.01, 5]]
+    # and neither is anything until a new snapshot arrives
+    assert not book.apply(change(1, 2))
+    assert book.apply(snapshot(10, [(0.02, 1)], []))
+    assert book.synced and book.change_id == 10
+    assert book.apply(change(10, 11, asks=[["new", 0.03, 2]]))
+    assert book.levels() == {"bids": [[0.02, 1]], "asks": [[0.03, 2]]}
+
+
+def test_change_before_snapshot_is_rejected():
+    book = Local_Order_Book("ETH-30JUN23-2000-C")
+    assert not book.apply(change(None, 1, bids=[["new", 0.01, 1]]))
+    assert book.levels() == {"bids": [], "asks": []}
+
+
+def test_reset_requires_a_new_snapshot():
+    book = Local_Order_Book("ETH-30JUN23-2000-C")
+    book.apply(snapshot(1, [(0.01, 5)], []))
+    book.reset()
+    assert not book.apply(change(1, 2))
+    assert book.apply(snapshot(3, [], []))
@@ -0,0 +1,100 @@
+import types
+import numpy as np
+import pytest
+
+pytest.importorskip("web3")
+
+import dopex_pricer
+from dopex_pricer import Dopex_Pricer, black_scholes_call, norm_cdf
+
+EXPIRY = 1_700_000_000
+NOW = EXPIRY - 7 * 86400
+
+
+class Fake_Template:
+    def __init__(self, fn_name):
+        self.fn_name = fn_name
+
+    def encode(self, *args):
+        return (self.fn_name, args)
+
+
+class Fake_Snapshot:
+    """
+    aggregate answers calculatePremium with the on-chain premiums given per strike, None when it reverts
+    """
+
+    def __init__(self, premiums):
+        self.premiums = premiums
+        self.block_number = 1
+        self.multicall = None
+
+    def aggregate(self, calls):
+        rets = []
+        for call in calls:
+            fn_name, args = call["callData"]
+            premium = self.premiums[args[0] / 10**8]
+            rets.append(None if premium is None else int(premium * 10**18).to_bytes(32, "big"))
+        return [self.block_number, rets]
+
+
+@pytest.fixture
+def make_pricer(monkeypatch):
+    monkeypatch.setattr(dopex_pricer, "get_template", lambda contract, fn_name: Fake_Template(fn_name))
+
+    def make_pricer(premiums, min_option_price_pct=0):
+        pricer = Dopex_Pricer(types.SimpleNamespace(address="0xssov"), Fake_Snapshot(premiums))
+        pricer.min_option_price_pct = min_option_price_pct
+        pricer.strikes = np.array(sorted(premiums), dtype=float)
+        pricer.underlying_price = 2000.0
+        pricer.collateral_price = 2000.0
+        pricer.block_timestamp = NOW
+        pricer.volatilities = np.full(len(premiums), 0.8)
+        pricer.fees = np.zeros(len(premiums))
+        return pricer
+
+    return make_pricer
+
+
+def test_norm_cdf_and_black_scholes():
+    np.testing.assert_allclose(norm_cdf([0.0, 1.0, -1.96]), [0.5, 0.8413447, 0.0249979], atol=1e-7)
+    assert black_scholes_call(2000, [1500], 0, 0.8)[0] == 500
+    assert black_scholes_call(2000, [2000], 0.1, 0.8)[0] == pytest.approx(2000 * (2 * norm_cdf(0.8 * 0.1**0.5 / 2) - 1))
+
+
+def test_min_option_price_floors_local_premiums(make_pricer):
+    pricer = make_pricer({2000: 0.05, 1_000_000: 0.0}, min_option_price_pct=1)
+    premiums = pricer.get_premiums(np.arange(2), EXPIRY)
+    assert premiums[1] == pytest.approx(0.01)
+    assert premiums[0] > 0.01
+
+
+def test_cross_check_calibrates_priced_strikes(make_pricer):
+    pricer = make_pricer({2000: None, 2100: None})
+    local = pricer.get_premiums(np.arange(2), EXPIRY)
+    pricer.snapshot.premiums = {2000: 1.1 * local[0], 2100: 0.9 * local[1]}
+    pricer.cross_check(EXPIRY)
+    np.testing.assert_allclose(pricer.get_premiums(np.arange(2), EXPIRY), [1.1 * local[0], 0.9 * local[1]], rtol=1e-9)
+    assert pricer.drift == pytest.approx(0.1)
+
+
+def test_cross_check_skips_unreadable_premiums(make_pricer):
+    pricer = make_pricer({2000: None, 2100: None})
+    local = pricer.get_premiums(np.arange(2), EXPIRY)
+    pricer.snapshot.premiums = {2000: 1.1 * local[0], 2100: 1.2 * local[1]}
+    pricer.cross_check(EXPIRY)
+    pricer.snapshot.premiums = {2000: None, 2100: 1.2 * local[1]}
+    pricer.cross_check(EXPIRY)
+    # 2000 keeps the calibration of the first cross-check, nan never reaches the drift
+    np.testing.assert_allclose(pricer.get_premiums(np.arange(2), EXPIRY), [1.1 * local[0], 1.2 * local[1]], rtol=1e-9)
+    assert pricer.drift == pytest.approx(0.2)
+
+
+def test_zero_local_premium_uses_the_onchain_premium(make_pricer):
+    pricer = make_pricer({2000: None, 1_000_000: 0.002})
+    assert pricer.get_premiums(np.arange(2), EXPIRY)[1] == 0
+    local = pricer.get_premiums(np.arange(2), EXPIRY)
+    pricer.snapshot.premiums[2000] = local[0]
+    pricer.cross_check(EXPIRY)
+    assert pricer.get_premiums(np.array([1]), EXPIRY)[0] == pytest.approx(0.002)
+    assert pricer.drift == pytest.approx(0)
@@ -0,0 +1,93 @@
+import asyncio
+import types
+from engine import Arbitrage_Engine
+
+
+class Fake_Chain:
+    """
+    w3 stand-in whose block number moves on every poll
+    """
+
+    def __init__(self):
+        self.eth = self
+        self.polls = 0
+
+    @property
+    def block_number(self):
+        self.polls += 1
+        return self.polls
+
+
+def run_engine(engine, duration):
+    async def run():
+        asyncio.get_running_loop().call_later(duration, engine.stop)
+        await engine.run()
+
+    asyncio.run(run())
+
+
+def test_blocks_mark_only_the_instruments_of_their_chain():
+    updates = []
+    chain_instruments = {"arbitrum": {"ETH-A-1500-C", "ETH-A-2000-C"}}
+    engine = Arbitrage_Engine(
+        updates.append,
+        chains={"arbitrum": Fake_Chain()},
+        chain_instruments=chain_instruments.get,
+        max_idle=60,
+        block_poll_interval=0.01,
+        block_scan_interval=0,
+    )
+    run_engine(engine, 0.3)
+    # the first evaluation is a full scan, blocks only re-evaluate the arbitrum instruments
+    assert updates[0] is None
+    assert len(updates) > 2
+    assert all(update <= chain_instruments["arbitrum"] for update in updates[1:])
+
+
+def test_block_scans_are_throttled():
+    updates = []
+    engine = Arbitrage_Engine(
+        updates.append,
+        chains={"arbitrum": Fake_Chain()},
+        chain_instruments=lambda network: {"ETH-A-1500-C"},
+        max_idle=60,
+        block_poll_interval=0.01,
+        block_scan_interval=0.2,
+    )
+    run_engine(engine, 0.5)
+    assert engine.blocks["arbitrum"] > 10
+    # initial full scan + one block triggered scan per 0.2s
+    assert 2 <= len(updates) <= 4
+
+
+def test_book_ticks_are_not_throttled():
+    updates = []
+    engine = Arbitrage_Engine(updates.append, max_idle=60)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for i in range(5):
+            loop.call_later(0.05 * (i + 1), engine.notify, f"ETH-A-{i}-C")
+        loop.call_later(0.4, engine.stop)
+        await engine.run()
+
+    asyncio.run(run())
+    assert updates[0] is None
+    assert set().union(*updates[1:]) == {f"ETH-A-{i}-C" for i in range(5)}
+
+
+def test_failed_evaluation_schedules_a_refresh(capsys):
+    calls = types.SimpleNamespace(refresh=0, updates=0)
+
+    def on_update(instrument_names):
+        calls.updates += 1
+        if calls.updates == 1:
+            raise Exception("stale board")
+
+    def refresh():
+        calls.refresh += 1
+
+    engine = Arbitrage_Engine(on_update, refresh=refresh, max_idle=0.05)
+    run_engine(engine, 0.3)
+    assert calls.refresh == 1
+    assert "evaluation failed: stale board" in capsys.readouterr().out
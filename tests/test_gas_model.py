@@ -0,0 +1,101 @@
+import types
+import pytest
+
+pytest.importorskip("web3")
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+import gas_model
+from gas_model import DEFAULT_GAS_LIMITS, Gas_Model
+
+WALLET = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+OPTIMISM_FEES = {"gasPrice": 10**6, "l1BaseFee": 30 * 10**9, "overhead": 188, "scalar": 684000, "decimals": 6}
+
+
+class Fake_Template:
+    def __init__(self, fn_name):
+        self.fn_name = fn_name
+
+    def encode(self, *args):
+        return self.fn_name
+
+
+class Fake_Snapshot:
+    def __init__(self, block_number=1, gas_price=10**8):
+        self.block_number = block_number
+        self.w3 = types.SimpleNamespace(eth=types.SimpleNamespace(gas_price=gas_price, block_number=block_number))
+        self.reads = 0
+
+    def aggregate(self, calls):
+        self.reads += 1
+        return [self.block_number, [OPTIMISM_FEES[call["callData"]].to_bytes(32, "big") for call in calls]]
+
+
+class Fake_Function:
+    def __init__(self, calldata, gas=None):
+        self.calldata = calldata
+        self.gas = gas
+        self.estimates = 0
+
+    def _encode_transaction_data(self):
+        return "0x" + self.calldata.hex()
+
+    def estimateGas(self, tx_params):
+        self.estimates += 1
+        if self.gas is None:
+            raise Exception("execution reverted")
+        return self.gas
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(gas_model, "get_template", lambda contract, fn_name: Fake_Template(fn_name))
+    model = Gas_Model.__new__(Gas_Model)
+    model.snapshots = {"arbitrum": Fake_Snapshot(), "optimism": Fake_Snapshot()}
+    model.gas_limits = dict(DEFAULT_GAS_LIMITS)
+    model.estimate_ttl = 600
+    model.actions = {}
+    model._estimates = {}
+    model._fee_params = {}
+    model._lock = gas_model.threading.Lock()
+    model.gas_price_oracle = types.SimpleNamespace(address="0xoracle")
+    return model
+
+
+def test_arbitrum_cost(model):
+    function = Fake_Function(bytes(4) + b"\x01" * 64, gas=500_000)
+    model.register("purchase", "arbitrum", lambda: function, WALLET)
+    assert model.get_cost("purchase", eth_usd=2000) == pytest.approx(500_000 * 10**8 / 1e18 * 2000)
+
+
+def test_optimism_cost_adds_the_l1_data_fee(model):
+    calldata = bytes(10) + b"\x01" * 20
+    model.register("openPosition", "optimism", lambda: Fake_Function(calldata, gas=1_000_000), WALLET)
+    data_gas = 4 * 10 + 16 * 20
+    l1_fee = (data_gas + 16 * 68 + 188) * 30 * 10**9 * 684000 / 10**6
+    expected = (1_000_000 * 10**6 + l1_fee) / 1e18 * 2000
+    assert model.get_cost("openPosition", eth_usd=2000) == pytest.approx(expected)
+    assert model.get_costs(["openPosition", "openPosition"], eth_usd=2000) == pytest.approx(2 * expected)
+
+
+def test_estimates_are_cached_and_fall_back_to_defaults(model, monkeypatch):
+    function = Fake_Function(b"\x01" * 8)
+    model.register("purchase", "arbitrum", lambda: function, WALLET)
+    assert model.estimate_gas("purchase") == (DEFAULT_GAS_LIMITS["purchase"], 16 * 8)
+    model.estimate_gas("purchase")
+    assert function.estimates == 1
+
+    clock = types.SimpleNamespace(now=gas_model.time.time() + 601)
+    monkeypatch.setattr(gas_model, "time", types.SimpleNamespace(time=lambda: clock.now))
+    function.gas = 123_000
+    assert model.estimate_gas("purchase")[0] == 123_000
+
+
+def test_fee_params_are_read_once_per_block(model):
+    snapshot = model.snapshots["optimism"]
+    assert model.get_fee_params("optimism")["l1_base_fee"] == OPTIMISM_FEES["l1BaseFee"]
+    model.get_fee_params("optimism")
+    assert snapshot.reads == 1
+    snapshot.block_number = 2
+    model.get_fee_params("optimism")
+    assert snapshot.reads == 2
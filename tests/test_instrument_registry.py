@@ -0,0 +1,42 @@
+import time
+from instrument_registry import Instrument_Registry
+
+EXPIRY = 1666339200  # 21 Oct 2022 08:00 UTC
+
+
+def test_names_use_the_utc_date(monkeypatch):
+    monkeypatch.setenv("TZ", "Pacific/Kiritimati")  # UTC+14, the local date is already the 22nd
+    time.tzset()
+    try:
+        registry = Instrument_Registry("ETH")
+        assert registry.timestamp_key(EXPIRY) == "ETH-21OCT22-"
+        assert registry.timestamp_key(EXPIRY + 15 * 3600) == "ETH-21OCT22-"
+        assert registry.timestamp_key(EXPIRY + 16 * 3600) == "ETH-22OCT22-"
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+
+
+def test_resolve_parses_the_deribit_expiry():
+    registry = Instrument_Registry("ETH")
+    instrument = registry.resolve("ETH-21OCT22-1300-C")
+    assert (instrument.spot, instrument.expiry, instrument.strike, instrument.option) == ("ETH", EXPIRY, 1300, "C")
+    assert registry.resolve("ETH-21OCT22-1300-C") is instrument
+
+
+def test_register_interns_and_completes_records():
+    registry = Instrument_Registry("ETH")
+    instrument = registry.register(EXPIRY, 1300, "C", strike_id=5)
+    assert instrument.instrument_name == "ETH-21OCT22-1300-C"
+    assert registry.register(EXPIRY, 1300, "C", strike_idx=2) is instrument
+    assert (instrument.strike_id, instrument.strike_idx) == (5, 2)
+    assert registry["ETH-21OCT22-1300-C"] is instrument
+    assert "ETH-21OCT22-1300-C" in registry and len(registry) == 1
+
+
+def test_drop_expired():
+    registry = Instrument_Registry("ETH")
+    registry.register(EXPIRY, 1300)
+    registry.register(EXPIRY + 86400, 1300)
+    registry.drop_expired(now=EXPIRY)
+    assert [instrument.expiry for instrument in registry] == [EXPIRY + 86400]
@@ -0,0 +1,127 @@
+import time
+import types
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("eth_abi")
+pytest.importorskip("web3")
+
+import lyra_boards
+from instrument_registry import Instrument_Registry
+from lyra_boards import Lyra_Board_Store
+
+EXPIRY = int(time.time()) + 7 * 86400
+LATER = EXPIRY + 7 * 86400
+
+
+class Fake_Response:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class Fake_Session:
+    """
+    Subgraph serving `strikes` (board_id, expiry, strike_id, strike) past the requested strikeId
+    """
+
+    def __init__(self, strikes):
+        self.strikes = strikes
+        self.requests = []
+        self.down = False
+
+    def post(self, endpoint, json):
+        variables = json["variables"]
+        self.requests.append((int(variables["after"]), variables["first"]))
+        if self.down:
+            return Fake_Response({}, status_code=502)
+        page = [strike for strike in self.strikes if strike[2] > int(variables["after"])][: variables["first"]]
+        return Fake_Response(
+            {
+                "data": {
+                    "strikes": [
+                        {
+                            "strikeId": str(strike_id),
+                            "strikePrice": str(strike * 10**18),
+                            "board": {"boardId": str(board_id), "expiryTimestamp": str(expiry)},
+                        }
+                        for board_id, expiry, strike_id, strike in page
+                    ]
+                }
+            }
+        )
+
+
+def make_store(strikes, page_size=2, optionmarket=None, get_strikes=None):
+    store = Lyra_Board_Store(
+        "http://subgraph",
+        "sETH",
+        optionmarket,
+        types.SimpleNamespace(block_identifier="latest"),
+        get_strikes,
+        Instrument_Registry("ETH").timestamp_key,
+        page_size=page_size,
+    )
+    store.session = Fake_Session(strikes)
+    return store
+
+
+def test_first_refresh_pages_through_every_strike():
+    store = make_store([(1, EXPIRY, 1, 1500), (1, EXPIRY, 2, 1400), (2, LATER, 3, 2000)])
+    option_boards = store.refresh()
+    assert store.session.requests == [(0, 2), (2, 2)]
+    board = option_boards[store.timestamp_key(EXPIRY)]
+    # strikes sorted by price
+    assert board["strike_ids"] == [2, 1] and board["strikes"] == [1400, 1500]
+    assert board["calls"][0] == store.timestamp_key(EXPIRY) + "1400-C"
+    assert option_boards[store.timestamp_key(LATER)]["strikes"] == [2000]
+
+
+def test_later_refreshes_only_ask_for_new_strikes():
+    store = make_store([(1, EXPIRY, 1, 1500)])
+    first = store.refresh()
+    assert store.refresh() is first
+    store.session.strikes.append((2, LATER, 5, 2500))
+    option_boards = store.refresh()
+    assert [after for after, _ in store.session.requests] == [0, 1, 1]
+    assert option_boards[store.timestamp_key(LATER)]["strike_ids"] == [5]
+
+
+def test_expired_boards_are_dropped():
+    store = make_store([(1, EXPIRY, 1, 1500), (2, LATER, 2, 2000)])
+    store.refresh()
+    store.drop_expired(now=EXPIRY)
+    assert list(store.option_boards) == [store.timestamp_key(LATER)]
+
+
+def test_chain_fallback_reads_only_unknown_strikes(monkeypatch, capsys):
+    boards = {1: (1, EXPIRY, 0, False, [1, 2]), 2: (2, LATER, 0, False, [3])}
+    optionmarket = types.SimpleNamespace(
+        address="0xmarket",
+        functions=types.SimpleNamespace(
+            getLiveBoards=lambda: types.SimpleNamespace(call=lambda block_identifier: list(boards))
+        ),
+    )
+    requested = []
+
+    def get_strikes(strike_ids):
+        requested.append(list(strike_ids))
+        return [1000 + 100 * strike_id for strike_id in strike_ids]
+
+    store = make_store([(1, EXPIRY, 1, 1100)], optionmarket=optionmarket, get_strikes=get_strikes)
+    store.refresh()
+    store.session.down = True
+    store.snapshot.aggregate = lambda calls: [1, [call["callData"] for call in calls]]
+    monkeypatch.setattr(
+        lyra_boards, "get_template", lambda contract, fn_name: types.SimpleNamespace(encode=lambda board_id: board_id)
+    )
+    monkeypatch.setattr(lyra_boards, "decode_abi", lambda types, board_id: [boards[board_id]])
+
+    option_boards = store.refresh()
+    assert "reading boards on-chain" in capsys.readouterr().out
+    assert requested == [[2, 3]]
+    assert option_boards[store.timestamp_key(EXPIRY)]["strike_ids"] == [1, 2]
+    assert option_boards[store.timestamp_key(LATER)]["strikes"] == [1300]
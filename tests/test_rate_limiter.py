@@ -0,0 +1,68 @@
+import asyncio
+import types
+import pytest
+import rate_limiter
+from rate_limiter import Credit_Bucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake monotonic clock, asyncio.sleep in rate_limiter advances it instead of waiting
+    NOTE: rates are powers of two so the refills add up exactly
+    """
+    clock = types.SimpleNamespace(now=0.0, sleeps=[])
+
+    async def sleep(delay):
+        clock.sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(rate_limiter, "asyncio", types.SimpleNamespace(sleep=sleep))
+    return clock
+
+
+def test_burst_then_sustained_rate(clock):
+    bucket = Credit_Bucket(rate=8, burst=5)
+
+    async def run():
+        for _ in range(5):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+
+    asyncio.run(run())
+    assert clock.sleeps == [0.125]
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = Credit_Bucket(rate=10, burst=5)
+    bucket.tokens = 0
+    clock.now += 60
+    bucket._refill(clock.now)
+    assert bucket.tokens == 5
+
+
+def test_cost_above_available_tokens_waits(clock):
+    bucket = Credit_Bucket(rate=4, burst=8)
+    bucket.tokens = 1
+    asyncio.run(bucket.acquire(cost=3))
+    assert sum(clock.sleeps) == pytest.approx(0.5)
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_back_off_blocks_the_bucket(clock):
+    bucket = Credit_Bucket(rate=64, burst=10)
+    bucket.back_off(2.0)
+    assert bucket.tokens == 0
+    asyncio.run(bucket.acquire())
+    assert clock.now == 2.0
+
+
+def test_configure_keeps_spent_tokens(clock):
+    bucket = Credit_Bucket(rate=10, burst=20)
+    bucket.tokens = 3
+    bucket.configure(rate=50, burst=100)
+    assert (bucket.rate, bucket.burst, bucket.tokens) == (50, 100, 3)
+    bucket.configure(rate=5, burst=2)
+    assert bucket.tokens == 2
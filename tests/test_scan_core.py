@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from scan_core import ONEYEAR, Scan_Core
+
+NOW = 1_700_000_000
+EXPIRY = NOW + ONEYEAR / 12
+
+
+def evaluate(core, **kwargs):
+    arguments = dict(
+        names=["ETH-A-1500-C", "ETH-A-2000-C"],
+        strikes=[1500, 2000],
+        expiries=[EXPIRY, EXPIRY],
+        amounts=[1, 2],
+        buy=np.array([[10.0, 21.0], [5.0, 11.0]]),
+        sell=np.array([[12.0, 26.0], [5.5, 10.0]]),
+        gas=0.5,
+        now=NOW,
+    )
+    arguments.update(kwargs)
+    return core.evaluate(**arguments)
+
+
+def test_pnl_and_apr():
+    core = Scan_Core(margin=1.25)
+    result = evaluate(core)
+    np.testing.assert_allclose(result["pnl"], [1.5, 4.5, 0.0, -1.5])
+    np.testing.assert_array_equal(result["row"], [0, 0, 1, 1])
+    np.testing.assert_array_equal(result["amount"], [1, 2, 1, 2])
+    expected = np.array([1.5, 4.5 / 2, 0.0, -1.5 / 2]) * 100 * 12 / (1.25 * np.repeat([1500, 2000], 2))
+    np.testing.assert_allclose(result["apr"], expected)
+
+
+def test_apr_of_the_sell_leg_collateral():
+    core = Scan_Core(margin=1.25)
+    collateral = np.array([[300.0, np.nan], [np.nan, np.nan]])
+    result = evaluate(core, collateral=collateral)
+    np.testing.assert_allclose(result["collateral"], [300.0, 1.25 * 1500 * 2, 1.25 * 2000, 1.25 * 2000 * 2])
+    np.testing.assert_allclose(result["apr"][0], 1.5 * 100 * 12 / 300)
+    assert core.candidate(0).collateral == 300.0
+
+
+def test_best_filters_on_pnl_and_apr():
+    core = Scan_Core()
+    evaluate(core)
+    best = core.best()
+    assert best.instrument_name == "ETH-A-1500-C" and best.amount == 2
+    assert best.buy_venue is None and best.sell_venue is None
+    assert core.best(min_pnl=10) is None
+    assert core.best(min_apr=best.apr + 1) is None
+
+
+def test_nan_quotes_are_never_selected():
+    core = Scan_Core()
+    evaluate(core, sell=np.array([[np.nan, np.nan], [5.5, 10.0]]))
+    assert core.best().instrument_name == "ETH-A-2000-C"
+    evaluate(core, sell=np.full((2, 2), np.nan))
+    assert core.best() is None
+
+
+def test_per_instrument_gas_and_venues():
+    core = Scan_Core()
+    result = evaluate(
+        core,
+        gas=np.array([0.5, 1.0]),
+        buy_venues=np.array([0, 1]),
+        sell_venues=np.array([1, 2]),
+        venue_names=["dopex", "deribit", "lyra"],
+    )
+    np.testing.assert_allclose(result["gas"], [0.5, 0.5, 1.0, 1.0])
+    candidate = core.candidate(2)
+    assert (candidate.buy_venue, candidate.sell_venue) == ("deribit", "lyra")
+    assert core.best().buy_venue == "dopex"
+
+
+def test_leg_blocks():
+    core = Scan_Core()
+    result = evaluate(core, buy_blocks=np.array([120, 120]), sell_blocks=np.array([-1, 7]))
+    np.testing.assert_array_equal(result["sell_block"], [-1, -1, 7, 7])
+    assert (core.candidate(0).buy_block, core.candidate(0).sell_block) == (120, None)
+    assert core.candidate(3).sell_block == 7
+    evaluate(core)
+    assert (core.candidate(0).buy_block, core.candidate(0).sell_block) == (None, None)
+
+
+def test_buffer_is_reused_and_grown():
+    core = Scan_Core(capacity=2)
+    buffer = evaluate(core).base
+    assert core.size == 4 and len(core._buffer) >= 4
+    evaluate(core, names=["ETH-A-1500-C"], strikes=[1500], expiries=[EXPIRY], buy=np.ones((1, 2)), sell=np.ones((1, 2)))
+    assert core.size == 2
+    assert core.result.base is buffer
+
+
+def test_empty_scan():
+    core = Scan_Core()
+    result = evaluate(core, names=[], strikes=[], expiries=[], buy=np.empty((0, 2)), sell=np.empty((0, 2)))
+    assert len(result) == 0
+    assert core.best() is None
+
+
+def test_to_frame():
+    pytest.importorskip("pandas")
+    core = Scan_Core()
+    evaluate(core, buy_venues=np.array([0, 0]), sell_venues=np.array([1, 1]), venue_names=["dopex", "deribit"])
+    frame = core.to_frame("ETH-A-2000-C")
+    assert list(frame["Order Sizes"]) == [1, 2]
+    assert list(frame["Sell Venue"]) == ["deribit", "deribit"]
+    assert list(frame["Buy Block"]) == [None, None]
+    assert frame["Expiry"][0].timestamp() == EXPIRY and frame["Expiry"][0].utcoffset().total_seconds() == 0
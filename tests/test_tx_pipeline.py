@@ -0,0 +1,96 @@
+import types
+import pytest
+import tx_pipeline
+from tx_pipeline import Tx_Pipeline
+
+WALLET = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+
+class Fake_Eth:
+    def __init__(self, nonce=7, gas_price=100):
+        self.nonce = nonce
+        self._gas_price = gas_price
+        self.gas_price_reads = 0
+        self.nonce_reads = 0
+        self.sent = []
+        self.fail_send = False
+        self.account = types.SimpleNamespace(sign_transaction=self.sign_transaction)
+
+    @property
+    def gas_price(self):
+        self.gas_price_reads += 1
+        return self._gas_price
+
+    def get_transaction_count(self, wallet, block_identifier):
+        self.nonce_reads += 1
+        return self.nonce
+
+    def sign_transaction(self, tx, private_key):
+        return types.SimpleNamespace(rawTransaction=(tx, private_key))
+
+    def send_raw_transaction(self, raw):
+        if self.fail_send:
+            raise Exception("nonce too low")
+        self.sent.append(raw[0])
+        return f"0xhash{len(self.sent)}"
+
+    def wait_for_transaction_receipt(self, tx_hash):
+        return {"transactionHash": tx_hash, "status": 1}
+
+
+class Fake_Function:
+    def buildTransaction(self, tx_params):
+        return dict(tx_params, data="0x")
+
+
+@pytest.fixture
+def eth():
+    return Fake_Eth()
+
+
+@pytest.fixture
+def pipeline(eth):
+    return Tx_Pipeline(types.SimpleNamespace(eth=eth), chain_id=42161, private_key="key")
+
+
+def test_nonces_are_tracked_locally(pipeline, eth):
+    hashes = [pipeline.submit(Fake_Function(), WALLET)[0] for _ in range(3)]
+    assert [tx["nonce"] for tx in eth.sent] == [7, 8, 9]
+    assert eth.nonce_reads == 1
+    assert hashes == ["0xhash1", "0xhash2", "0xhash3"]
+    assert all(tx["chainId"] == 42161 and tx["from"] == WALLET for tx in eth.sent)
+
+
+def test_receipt_future(pipeline):
+    tx_hash, receipt = pipeline.submit(Fake_Function(), WALLET, gas=21000)
+    assert receipt.result(timeout=5) == {"transactionHash": tx_hash, "status": 1}
+
+
+def test_gas_is_only_set_when_given(pipeline, eth):
+    pipeline.submit(Fake_Function(), WALLET)
+    pipeline.submit(Fake_Function(), WALLET, gas=300000)
+    assert "gas" not in eth.sent[0] and eth.sent[1]["gas"] == 300000
+
+
+def test_failed_broadcast_resyncs_the_nonce(pipeline, eth):
+    pipeline.submit(Fake_Function(), WALLET)
+    eth.fail_send = True
+    with pytest.raises(Exception):
+        pipeline.submit(Fake_Function(), WALLET)
+    eth.fail_send = False
+    eth.nonce = 8
+    pipeline.submit(Fake_Function(), WALLET)
+    assert [tx["nonce"] for tx in eth.sent] == [7, 8]
+    assert eth.nonce_reads == 2
+
+
+def test_gas_price_is_cached_for_its_ttl(pipeline, eth, monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(tx_pipeline, "time", types.SimpleNamespace(time=lambda: clock.now))
+    assert pipeline.gas_price() == 100
+    eth._gas_price = 120
+    clock.now += 4
+    assert pipeline.gas_price() == 100
+    clock.now += 2
+    assert pipeline.gas_price() == 120
+    assert eth.gas_price_reads == 2
@@ -0,0 +1,174 @@
+import asyncio
+import types
+import numpy as np
+import pytest
+
+for module in ("web3", "eth_abi", "requests", "aiohttp", "dotenv", "websockets"):
+    pytest.importorskip(module)
+
+import venue_arbitrager
+from deribit_agent import Deribit_Agent, Deribit_Result
+from instrument_registry import Instrument_Registry
+from venue_arbitrager import Venue_Arbitrager
+from venues import Deribit_Venue, Venue, Venue_Quotes
+
+EXPIRY = 1_900_000_000
+REGISTRY = Instrument_Registry("ETH")
+
+
+class Fake_Venue(Venue):
+    """
+    Venue quoting every call at a fixed USD price per option (buy at `ask`, sell at `bid`)
+    """
+
+    def __init__(self, name, sides, strikes, ask=None, bid=None, network=None, block=None, collateral=None):
+        self.name = name
+        self.sides = sides
+        self.network = network
+        self.strikes = strikes
+        self.ask = ask
+        self.bid = bid
+        self.block = block
+        self.collateral = collateral
+        self.gas_operations = () if network is None else ("trade",)
+        self.quoted = []
+        self.trades = []
+        self.funds = {"usd": 1e9}
+
+    def list_instruments(self):
+        return [REGISTRY.register(EXPIRY, strike) for strike in self.strikes]
+
+    def pin(self):
+        return self.block
+
+    def get_index_price(self):
+        return 2000.0
+
+    def quote_surface(self, instruments, amounts, index_price):
+        self.quoted.append([instrument.instrument_name for instrument in instruments])
+        grid = np.outer(np.ones(len(instruments)), amounts)
+        return Venue_Quotes(
+            None if self.ask is None else self.ask * grid,
+            None if self.bid is None else self.bid * grid,
+            None if self.collateral is None else self.collateral * grid,
+        )
+
+    def balances(self):
+        return self.funds
+
+    def required_funds(self, instrument, amount, side, index_price):
+        return {"usd": 100 * amount}
+
+    def execute(self, instrument, amount, side, index_price):
+        self.trades.append((instrument.instrument_name, amount, side))
+
+
+class Fake_Gas_Model:
+    def __init__(self, snapshots, gas_limits=None, estimate_ttl=600):
+        pass
+
+    def get_costs(self, names, eth_usd=None):
+        return 1.0 * len(names)  # USD per on-chain leg
+
+
+def make_arbitrager(monkeypatch, venues):
+    monkeypatch.setattr(venue_arbitrager, "build_venues", lambda names, config: venues)
+    monkeypatch.setattr(venue_arbitrager, "Gas_Model", Fake_Gas_Model)
+    config = {"order_sizes": [1, 2], "gas_fees": 0.5, "margin": 1.25}
+    return Venue_Arbitrager(config)
+
+
+def test_venue_is_abstract():
+    class Partial_Venue(Venue):
+        def list_instruments(self):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial_Venue()
+
+
+def test_pairs_and_matched_instruments(monkeypatch):
+    dopex = Fake_Venue("dopex", ("buy",), [1500, 2000], ask=10.0, network="arbitrum", block=120)
+    deribit = Fake_Venue("deribit", ("buy", "sell"), [2000, 2500], ask=12.0, bid=11.0)
+    lyra = Fake_Venue("lyra", ("sell",), [1500, 2000, 2500], bid=13.0, network="optimism", block=7)
+    arbitrager = make_arbitrager(monkeypatch, [dopex, deribit, lyra])
+
+    assert arbitrager.pairs == [(0, 1), (0, 2), (1, 2)]
+    assert [instrument.strike for instrument in arbitrager.instruments] == [1500, 2000, 2500]
+    assert arbitrager.chain_instruments("optimism") == {
+        instrument.instrument_name for instrument in arbitrager.instruments
+    }
+    assert len(arbitrager.chain_instruments("arbitrum")) == 2
+
+
+def test_scan_quotes_each_venue_once(monkeypatch):
+    dopex = Fake_Venue("dopex", ("buy",), [1500, 2000], ask=10.0, network="arbitrum", block=120)
+    deribit = Fake_Venue("deribit", ("buy", "sell"), [2000, 2500], ask=12.0, bid=11.0)
+    lyra = Fake_Venue("lyra", ("sell",), [1500, 2000, 2500], bid=13.0, network="optimism", block=7, collateral=500)
+    arbitrager = make_arbitrager(monkeypatch, [dopex, deribit, lyra])
+
+    result = arbitrager.get_arb_data()
+    assert [len(venue.quoted) for venue in (dopex, deribit, lyra)] == [1, 1, 1]
+    # dopex->deribit: 2000, dopex->lyra: 1500 2000, deribit->lyra: 2000 2500, two sizes each
+    assert len(result) == 2 * 5
+
+    best = arbitrager.scan_core.best()
+    assert (best.buy_venue, best.sell_venue) == ("dopex", "lyra")
+    assert (best.buy_block, best.sell_block) == (120, 7)
+    assert best.pnl == pytest.approx(best.amount * (13 - 10) - 2.0)
+    assert best.collateral == pytest.approx(500 * best.amount)
+
+    deribit_row = next(i for i in range(len(result)) if arbitrager.scan_core.candidate(i).sell_venue == "deribit")
+    candidate = arbitrager.scan_core.candidate(deribit_row)
+    assert candidate.sell_block is None
+    assert candidate.pnl == pytest.approx(candidate.amount * (11 - 10) - 1.0)
+    assert candidate.collateral == pytest.approx(1.25 * candidate.strike * candidate.amount)
+
+
+def test_scan_of_dirty_instruments_only(monkeypatch):
+    dopex = Fake_Venue("dopex", ("buy",), [1500, 2000], ask=10.0)
+    lyra = Fake_Venue("lyra", ("sell",), [1500, 2000], bid=13.0)
+    arbitrager = make_arbitrager(monkeypatch, [dopex, lyra])
+    name = arbitrager.instruments[1].instrument_name
+    result = arbitrager.get_arb_data({name})
+    assert len(result) == 2 and lyra.quoted[-1] == [name]
+
+
+def test_trade_checks_balances_then_executes_both_legs(monkeypatch):
+    dopex = Fake_Venue("dopex", ("buy",), [2000], ask=10.0)
+    lyra = Fake_Venue("lyra", ("sell",), [2000], bid=13.0)
+    arbitrager = make_arbitrager(monkeypatch, [dopex, lyra])
+    name = arbitrager.instruments[0].instrument_name
+
+    lyra.funds = {"usd": 50}
+    with pytest.raises(Exception):
+        arbitrager.do_trade(name, 1, "dopex", "lyra")
+    assert dopex.trades == [] and lyra.trades == []
+
+    lyra.funds = {"usd": 1e9}
+    arbitrager.do_trade(name, 1, "dopex", "lyra")
+    assert dopex.trades == [(name, 1, "buy")] and lyra.trades == [(name, 1, "sell")]
+
+
+def test_failed_deribit_books_quote_nan(capsys):
+    agent = Deribit_Agent.__new__(Deribit_Agent)
+    agent.exchange_fee, agent.settlement_fee, agent.orderbook_depth = 0.0003, 0.00015, 5
+    agent.books = types.SimpleNamespace(get=lambda name, depth: None)
+    agent.run = asyncio.run
+    book = {"bids": [[0.01, 10.0]], "asks": [[0.012, 10.0]]}
+    instruments = [REGISTRY.register(EXPIRY, 1500), REGISTRY.register(EXPIRY, 2000)]
+
+    async def get_orderbooks(names, depth):
+        return {
+            instruments[0].instrument_name: Deribit_Result(book, None),
+            instruments[1].instrument_name: Deribit_Result(None, {"code": 10028, "message": "too_many_requests"}),
+        }
+
+    agent.get_orderbooks = get_orderbooks
+    venue = Deribit_Venue.__new__(Deribit_Venue)
+    venue.agent = agent
+
+    quotes = venue.quote_surface(instruments, [1, 2], 2000.0)
+    assert np.isfinite(quotes.buy[0]).all() and np.isfinite(quotes.sell[0]).all()
+    assert np.isnan(quotes.buy[1]).all() and np.isnan(quotes.sell[1]).all()
+    assert instruments[1].instrument_name in capsys.readouterr().out
@@ -1,6 +1,6 @@
-import time
+import asyncio
 import argparse
-from xml.dom.domreg import well_known_implementations
+from engine import Arbitrage_Engine
 from arbitrager import Arbitrager
 
 WELCOME = """
@@ -39,15 +39,16 @@ parser.add_argument("--idx", dest="index", metavar="index", help="define index t
 parser.add_argument("--spot", dest="spot", help="define spot currency", type=str)
 parser.add_argument("--w", dest="wallet", metavar="wallet", help="define wallet", type=str)
 parser.add_argument("--slpP", dest="sleep_period", metavar="sleep_period", help="define sleep period", type=str)
-parser.add_argument("--exp", dest="expiry", metavar="expiry", help="define expiry unix timestamp", type=int)
+parser.add_argument("--exp", dest="expiry", metavar="expiry", help="scan this expiry only (unix timestamp)", type=int)
 parser.add_argument("--siz", dest="order_sizes", metavar="order_sizes", help="define order sizes", type=int, nargs="+")
+parser.add_argument("--ven", dest="venues", metavar="venues", help="define venues", type=str, nargs="+")
 parser.add_argument("--trd", dest="trading", help="toggle on trading mode", action="store_true")
 
 TARGET_PROFIT = -10
 TARGET_APR = -100
 SLEEP_TIME = 2 # 30
-KEY_WORD = "-C"
 TRADING = False
+SILENT = False
 
 str_month = {
     1: "JAN",
@@ -72,102 +73,58 @@ config_eth = {
     "spot": "ETH",
     "wallet": "0x",
     "sleep_period": 10,
-    "expiry": 1666339200,
     "order_sizes": [1, 2, 5, 10],
 }
 
+# built in main() once the command line config is applied, importing the bot stays offline
+agent = None
 
-agent = Arbitrager(config_eth)
 
+def run_search(instrument_names=None):
 
-def run_search():
+    scan = agent.get_arb_data(instrument_names)
+    if not SILENT:
+        print(agent.scan_core.to_frame())
 
-    df = agent.get_arb_data()
-    print(df)
+    best = agent.scan_core.best(TARGET_PROFIT, TARGET_APR)
+    if best is not None:
+        print(
+            f"instrument: {best.instrument_name}.. buy on {best.buy_venue}, sell on {best.sell_venue}. "
+            f"order_size: {best.amount}. "
+            f"pnl: {round(best.pnl, 2)}. apr: {round(best.apr, 2)}"
+        )
+        if TRADING:
+            agent.do_trade(best.instrument_name, best.amount, best.buy_venue, best.sell_venue)
 
-    df.sort_values("APR", inplace=True)
-    df_opp = df[df["APR"] >= TARGET_APR]
-    apr_max = -1
-    row_max = None
+    return scan
 
-    if len(df_opp) > 0:
 
-        for row in df_opp.iterrows():
-            row = row[1]
-            instrument = row["instrument_name"]
-
-            if KEY_WORD in instrument:
-                apr = row["APR"]
-                print(f"Found opportunity for this week, searching {instrument}. apr: {apr}")
-
-                try:
-                    df_instrument = agent.search_instrument(instrument)
-                    df_instrument.sort_values("APR", inplace=True)
-                    print(df_instrument)
-
-                    for row in df_instrument.iterrows():
-                        row = row[1]
-
-                        if row["PNL (USD)"] > TARGET_PROFIT:
-                            order_size = row["Order Sizes"]
-
-                            print(
-                                f"instrument: {instrument}.. order_size: {order_size}. pnl: {round(row['PNL (USD)'],2)}. apr: {round(row['APR'],2)}"
-                            )
-
-                            if row["APR"] > apr_max:
-                                row_max = row
-                                apr_max = row["APR"]
-
-                except:
-                    print(f"Review search_instrument function, row: {row}")
-
-        if TRADING and row_max:
-            agent.do_trade(row["instrument_name"], row["Order Sizes"])
-
-    return df
-
-
-# running each half minute
 def run_bot():
-
+    """
+    Re-evaluate on market data events until SIGINT/SIGTERM, see engine.Arbitrage_Engine
+    """
     print("start of the loop")
-    i = 0
-
-    while True:
-        print(f"entering loop {i}...")
-
-        try:
-            run_search()
-            i += 1
-
-        except:
-            try:
-                agent.update()
-                run_search()
-                i += 1
-
-            except Exception as e:
-                i += 1
-
-        time.sleep(SLEEP_TIME)
-        
-        if ((i%1) == 0):
-            cont = input("Continue? [Y/N] ")
-
-            while not (cont in ("Y", "N")):
-
-                print("\nInvalid input. Please type Y for `yes` and N for `no`.\n\n")
-                cont = input("Continue? [Y/N] ")
-
-            if cont == "N":
-                break
+    engine = Arbitrage_Engine(
+        run_search,
+        chains=agent.chains,
+        chain_instruments=agent.chain_instruments,
+        refresh=agent.update,
+        max_idle=SLEEP_TIME,
+    )
+    # every book tick of a tracked instrument re-evaluates that instrument only
+    agent.add_listener(engine.notify)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        agent.close()
 
 
 def main():
+    global agent, TRADING, SILENT, TARGET_PROFIT, TARGET_APR, SLEEP_TIME
 
     args = parser.parse_args()
-    
+    SILENT = args.sil
+
     if not args.sil:
         print(WELCOME)
 
@@ -198,6 +155,7 @@ def main():
         
         config_eth.update(providedArgs)
 
+    agent = Arbitrager(config_eth)
     run_bot()
 
 if __name__ == "__main__":
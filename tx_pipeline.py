@@ -0,0 +1,71 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Tx_Pipeline:
+    """
+    Signs and broadcasts transactions of one chain without blocking on receipts
+
+    Nonces are tracked locally per wallet (read from the chain once, then incremented),
+    the gas price is cached for `gas_price_ttl` seconds and every broadcast returns a
+    future resolving to the receipt, so several transactions can be in flight at once.
+    """
+
+    def __init__(self, w3, chain_id, private_key, gas_price_ttl=5, max_workers=4):
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.private_key = private_key
+        self.gas_price_ttl = gas_price_ttl
+
+        self.nonces = {}
+        self._gas_price = None
+        self._gas_price_at = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def gas_price(self):
+        with self._lock:
+            if self._gas_price is None or time.time() - self._gas_price_at > self.gas_price_ttl:
+                self._gas_price = self.w3.eth.gas_price
+                self._gas_price_at = time.time()
+            return self._gas_price
+
+    def next_nonce(self, wallet):
+        with self._lock:
+            if wallet not in self.nonces:
+                self.nonces[wallet] = self.w3.eth.get_transaction_count(wallet, "pending")
+            nonce = self.nonces[wallet]
+            self.nonces[wallet] += 1
+            return nonce
+
+    def resync(self, wallet):
+        """
+        Forget the local nonce of wallet, it is read from the chain on the next transaction
+        """
+        with self._lock:
+            self.nonces.pop(wallet, None)
+
+    def submit(self, contract_function, wallet, gas=None):
+        """
+        Build, sign and broadcast contract_function from wallet right away
+        Output: (tx_hash, Future resolving to the transaction receipt)
+        """
+        tx_params = {
+            "chainId": self.chain_id,
+            "gasPrice": self.gas_price(),
+            "from": wallet,
+            "nonce": self.next_nonce(wallet),
+        }
+        if gas is not None:
+            tx_params["gas"] = gas
+        try:
+            tx = contract_function.buildTransaction(tx_params)
+            signed_tx = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
+            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except Exception:
+            # the nonce was not used (or was stale), read it again next time
+            self.resync(wallet)
+            raise
+        receipt = self._executor.submit(self.w3.eth.wait_for_transaction_receipt, tx_hash)
+        return tx_hash, receipt
@@ -0,0 +1,276 @@
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from gas_model import Gas_Model
+from scan_core import Scan_Core
+from venues import build_venues
+from instrument_registry import get_instrument_registry
+
+
+class Venue_Arbitrager:
+    """
+    Buys calls on one venue and sells them on another, for every buy venue / sell venue pair
+
+    Each scan pins every venue, quotes each venue once for all the instruments it shares with
+    another venue (one batch per venue, venues in parallel) and evaluates every pair from these
+    surfaces in one Scan_Core pass, so a new venue adds one batch per scan, not one per pair.
+    """
+
+    def __init__(self, config, venues=None):
+        self.wallet = config.get("wallet")
+        self.order_sizes = config.get("order_sizes")
+        self.gas_fees = config.get("gas_fees", 0.2)  # USD per on-chain leg, fallback when the gas model fails
+        self.margin = config.get("margin", 1.25)
+        self.expiry = config.get("expiry")  # scan this expiry only, every expiry listed by two venues if None
+        self.instrument_registry = get_instrument_registry(config.get("spot", "ETH"))
+
+        self.venues = build_venues(venues or config.get("venues", ["dopex", "deribit"]), config)
+        self.venues_by_name = {venue.name: venue for venue in self.venues}
+        self.pairs = [
+            (buy_venue, sell_venue)
+            for buy_venue, venue in enumerate(self.venues)
+            if "buy" in venue.sides
+            for sell_venue, other in enumerate(self.venues)
+            if "sell" in other.sides and other is not venue
+        ]
+        if not self.pairs:
+            raise Exception(f"No buy venue / sell venue pair in {[venue.name for venue in self.venues]}")
+
+        self.gas_model = Gas_Model(
+            {venue.network: venue.snapshot for venue in self.venues if venue.network is not None},
+            config.get("gas_limits"),
+            config.get("gas_estimate_ttl", 600),
+        )
+        for venue in self.venues:
+            venue.register_gas(self.gas_model, self.wallet)
+
+        self.scan_core = Scan_Core(self.margin)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.venues))
+        self.listed = {}  # venue name -> names of the instruments it lists
+        self.expiries = []  # expiries of self.instruments
+        self.chain_names = {}  # network -> names of self.instruments listed by a venue on it
+        self._pair_rows = None
+        self.instruments = self.get_instruments()
+
+    @property
+    def chains(self):
+        """
+        network -> Web3 of the on-chain venues, for block watching
+        """
+        return {venue.network: venue.w3 for venue in self.venues if venue.network is not None}
+
+    def chain_instruments(self, network):
+        """
+        Names of the scanned instruments quoted by the venues on network, their quotes move with its blocks
+        """
+        return self.chain_names.get(network, frozenset())
+
+    def get_instruments(self):
+        """
+        Instruments listed by the buy and the sell venue of at least one pair, over every expiry
+        """
+        listings = [self._executor.submit(venue.list_instruments) for venue in self.venues]
+        listings = [listing.result() for listing in listings]
+        self.listed = {
+            venue.name: {instrument.instrument_name for instrument in listing}
+            for venue, listing in zip(self.venues, listings)
+        }
+
+        matched = {}
+        for buy_venue, sell_venue in self.pairs:
+            sell_names = self.listed[self.venues[sell_venue].name]
+            for instrument in listings[buy_venue]:
+                if self.expiry is not None and instrument.expiry != self.expiry:
+                    continue
+                if instrument.instrument_name in sell_names:
+                    matched[instrument.instrument_name] = instrument
+        instruments = sorted(matched.values(), key=lambda instrument: (instrument.expiry, instrument.strike))
+
+        chain_names = {}
+        for venue in self.venues:
+            venue_instruments = self.get_venue_instruments(venue, instruments)
+            venue.track(venue_instruments)
+            if venue.network is not None:
+                names = {instrument.instrument_name for instrument in venue_instruments}
+                chain_names[venue.network] = chain_names.get(venue.network, frozenset()) | names
+        self.chain_names = chain_names
+        self.expiries = sorted({instrument.expiry for instrument in instruments})
+        self._pair_rows = None
+        return instruments
+
+    def update(self):
+        """
+        Updates the listings of every venue and class instruments
+        """
+        self.instruments = self.get_instruments()
+
+    def get_arb_data(self, instrument_names=None):
+        """
+        PNL/APR of every pair x instrument in self.instruments (or the ones in instrument_names) x order size
+        Output: structured array of the scan, see scan_core.Scan_Core
+        """
+        instruments = self.get_scan_instruments(instrument_names)
+        blocks = [-1 if block is None else block for block in self.pin_blocks()]
+        index_price = self.get_index_price()
+
+        # one batch per venue for all its instruments, every pair reads from these
+        venue_instruments = [self.get_venue_instruments(venue, instruments) for venue in self.venues]
+        quotes = [
+            self._executor.submit(venue.quote_surface, venue_instruments[i], self.order_sizes, index_price)
+            if venue_instruments[i]
+            else None
+            for i, venue in enumerate(self.venues)
+        ]
+        quotes = [None if future is None else future.result() for future in quotes]
+        gas = self.get_gas_fees(index_price)
+
+        names, strikes, expiries, leg_gas, buy_venues, sell_venues = [], [], [], [], [], []
+        buy_blocks, sell_blocks = [], []
+        buy, sell, collateral = [], [], []
+        for (buy_venue, sell_venue), (rows, buy_rows, sell_rows) in zip(
+            self.pairs, self.get_pair_rows(instruments, venue_instruments)
+        ):
+            if len(rows) == 0:
+                continue
+            names += [instruments[row].instrument_name for row in rows]
+            strikes += [instruments[row].strike for row in rows]
+            expiries += [instruments[row].expiry for row in rows]
+            buy.append(quotes[buy_venue].buy[buy_rows])
+            sell.append(quotes[sell_venue].sell[sell_rows])
+            if quotes[sell_venue].collateral is None:
+                collateral.append(np.full((len(rows), len(self.order_sizes)), np.nan))
+            else:
+                collateral.append(quotes[sell_venue].collateral[sell_rows])
+            leg_gas.append(np.full(len(rows), gas[buy_venue] + gas[sell_venue]))
+            buy_venues.append(np.full(len(rows), buy_venue))
+            sell_venues.append(np.full(len(rows), sell_venue))
+            buy_blocks.append(np.full(len(rows), blocks[buy_venue]))
+            sell_blocks.append(np.full(len(rows), blocks[sell_venue]))
+
+        shape = (0, len(self.order_sizes))
+        return self.scan_core.evaluate(
+            names,
+            strikes,
+            expiries,
+            self.order_sizes,
+            np.concatenate(buy) if buy else np.empty(shape),
+            np.concatenate(sell) if sell else np.empty(shape),
+            np.concatenate(leg_gas) if leg_gas else 0.0,
+            time.time(),
+            np.concatenate(buy_venues) if buy_venues else None,
+            np.concatenate(sell_venues) if sell_venues else None,
+            [venue.name for venue in self.venues],
+            np.concatenate(collateral) if collateral else None,
+            np.concatenate(buy_blocks) if buy_blocks else None,
+            np.concatenate(sell_blocks) if sell_blocks else None,
+        )
+
+    def search_instrument(self, instrument_name):
+        """
+        Rows of instrument_name in the last scan, as a DataFrame for display
+        """
+        return self.scan_core.to_frame(instrument_name)
+
+    #######################
+    #######  TRADING ######
+    ######################
+    def do_trade(self, instrument_name, order_size, buy_venue, sell_venue):
+        """
+        Buy order_size instrument_name on buy_venue then sell it on sell_venue, after checking both balances
+        """
+        instrument = self.instrument_registry.resolve(instrument_name)
+        index_price = self.get_index_price()
+        legs = [(self.venues_by_name[buy_venue], "buy"), (self.venues_by_name[sell_venue], "sell")]
+
+        # balances of both venues are read concurrently
+        balances = [self._executor.submit(venue.balances) for venue, _ in legs]
+        for (venue, side), balance in zip(legs, balances):
+            balance = balance.result()
+            for asset, required in venue.required_funds(instrument, order_size, side, index_price).items():
+                if balance.get(asset, 0) < required:
+                    raise Exception(f"Unsufficient {asset} balance in {venue.name}")
+
+        for venue, side in legs:
+            venue.execute(instrument, order_size, side, index_price)
+        print("Trade succesful")
+
+    def get_gas_fees(self, index_price):
+        """
+        USD gas cost of one trade on each venue, config gas_fees per leg if it cannot be read
+        """
+        gas = []
+        for venue in self.venues:
+            try:
+                gas.append(self.gas_model.get_costs(venue.gas_operations, index_price))
+            except Exception as e:
+                print(f"Gas model failed for {venue.name}, using gas_fees={self.gas_fees}: {e}")
+                gas.append(self.gas_fees)
+        return gas
+
+    #######################
+    #######  UTILS ########
+    ######################
+    def get_scan_instruments(self, instrument_names=None):
+        """
+        self.instruments, restricted to instrument_names when given (e.g the books that ticked)
+        """
+        if instrument_names is None:
+            return self.instruments
+        return [instrument for instrument in self.instruments if instrument.instrument_name in instrument_names]
+
+    def get_venue_instruments(self, venue, instruments):
+        listed = self.listed[venue.name]
+        return [instrument for instrument in instruments if instrument.instrument_name in listed]
+
+    def get_pair_rows(self, instruments, venue_instruments):
+        """
+        Per pair: (rows of instruments, rows in the buy venue surface, rows in the sell venue surface)
+        NOTE: cached for a scan of all self.instruments
+        """
+        if instruments is self.instruments and self._pair_rows is not None:
+            return self._pair_rows
+        positions = [
+            {instrument.instrument_name: row for row, instrument in enumerate(listing)} for listing in venue_instruments
+        ]
+        pair_rows = []
+        for buy_venue, sell_venue in self.pairs:
+            rows, buy_rows, sell_rows = [], [], []
+            for row, instrument in enumerate(instruments):
+                buy_row = positions[buy_venue].get(instrument.instrument_name)
+                sell_row = positions[sell_venue].get(instrument.instrument_name)
+                if buy_row is not None and sell_row is not None:
+                    rows.append(row)
+                    buy_rows.append(buy_row)
+                    sell_rows.append(sell_row)
+            pair_rows.append((rows, np.array(buy_rows, dtype=int), np.array(sell_rows, dtype=int)))
+        if instruments is self.instruments:
+            self._pair_rows = pair_rows
+        return pair_rows
+
+    def pin_blocks(self):
+        """
+        Pin every venue (on-chain reads to their latest block) until the next scan
+        Output: block number of each venue, None off chain
+        """
+        return [venue.pin() for venue in self.venues]
+
+    def get_index_price(self):
+        """
+        ETH/USD of the first venue that has one
+        """
+        for venue in self.venues:
+            index_price = venue.get_index_price()
+            if index_price is not None:
+                return index_price
+        raise Exception("No venue provides an index price")
+
+    def add_listener(self, callback):
+        """
+        callback(instrument_name) on every market data update a venue streams
+        """
+        for venue in self.venues:
+            venue.add_listener(callback)
+
+    def close(self):
+        for venue in self.venues:
+            venue.close()
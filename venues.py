@@ -0,0 +1,330 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from deribit_agent import Deribit_Agent
+from dopex_agent import Dopex_Agent
+from lyra_agent import Lyra_Agent, MAX_UINT
+from instrument_registry import get_instrument_registry
+
+
+class Venue_Quotes(namedtuple("Venue_Quotes", ["buy", "sell", "collateral"], defaults=(None,))):
+    """
+    USD price of the whole order, arrays (instruments, amounts), None for a side the venue does not trade
+    collateral: USD the venue locks for selling the whole order, None to use the scan's margin x strike
+    """
+
+
+class Venue(ABC):
+    """
+    A place calls are bought and/or sold, as seen by Venue_Arbitrager
+
+    Adapters wrap one agent and expose batch quoting, balances and execution in common units:
+    quotes in USD for the whole order, instruments as registry records.
+    """
+
+    name = None
+    sides = ()  # "buy" and/or "sell"
+    network = None  # chain of the venue contracts, None off chain
+    w3 = None
+    snapshot = None
+    gas_operations = ()  # Gas_Model actions of one trade
+
+    @abstractmethod
+    def list_instruments(self):
+        """
+        Output: Instrument records of the calls the venue lists
+        """
+
+    def track(self, instruments):
+        """
+        instruments of the venue that are scanned, e.g to stream their books
+        """
+
+    def pin(self):
+        """
+        Read every quote of the coming scan at one state of the venue
+        Output: block number of that state, None off chain
+        """
+
+    def get_index_price(self):
+        """
+        ETH/USD price of the venue, None when it has none
+        """
+        return None
+
+    @abstractmethod
+    def quote_surface(self, instruments, amounts, index_price):
+        """
+        Output: Venue_Quotes of every instrument x amount, in one batch
+        """
+
+    @abstractmethod
+    def balances(self):
+        """
+        Output: {asset: balance} of the wallet/account used on the venue
+        """
+
+    @abstractmethod
+    def required_funds(self, instrument, amount, side, index_price):
+        """
+        Output: {asset: amount} the venue needs to execute the trade
+        """
+
+    @abstractmethod
+    def execute(self, instrument, amount, side, index_price):
+        """
+        Trade amount of instrument, raises when the venue rejects it
+        """
+
+    def register_gas(self, gas_model, wallet):
+        pass
+
+    def add_listener(self, callback):
+        """
+        callback(instrument_name) on market data updates, for venues that stream them
+        """
+
+    def close(self):
+        pass
+
+
+class Dopex_Venue(Venue):
+    """
+    Dopex SSOV, calls can only be bought
+    """
+
+    name = "dopex"
+    sides = ("buy",)
+    network = "arbitrum"
+    gas_operations = ("purchase",)
+
+    def __init__(self, config):
+        self.agent = Dopex_Agent(config)
+        self.w3 = self.agent.w3
+        self.snapshot = self.agent.snapshot
+
+    def list_instruments(self):
+        instruments = []
+        for expiry, strikes in self.agent.get_live_expiries().items():
+            for strike in strikes:
+                instruments.append(
+                    self.agent.instrument_registry.register(
+                        expiry, strike, "C", strike_idx=self.agent.strike_to_idx[strike]
+                    )
+                )
+        return instruments
+
+    def pin(self):
+        return self.snapshot.pin()
+
+    def get_index_price(self):
+        return self.agent.get_eth_price()
+
+    def quote_surface(self, instruments, amounts, index_price):
+        strikes = [instrument.strike for instrument in instruments]
+        expiries = [instrument.expiry for instrument in instruments]
+        buy = self.agent.get_call_surface(strikes, expiries, amounts) * index_price
+        return Venue_Quotes(buy, None)
+
+    def balances(self):
+        return self.agent.get_token_balances(["weth"])
+
+    def required_funds(self, instrument, amount, side, index_price):
+        return {"weth": self.agent.get_call_quote(instrument.strike, instrument.expiry, amount)}
+
+    def execute(self, instrument, amount, side, index_price):
+        if side != "buy":
+            raise Exception("Dopex calls can only be bought")
+        receipt = self.agent.buy_call(instrument.strike, instrument.expiry, amount)
+        if receipt["status"] != 1:
+            raise Exception("Trade failed in Dopex please review")
+        return receipt
+
+    def register_gas(self, gas_model, wallet):
+        gas_model.register(
+            "purchase", "arbitrum", lambda: self.agent.ethweekly.functions.purchase(0, 10**18, wallet), wallet
+        )
+
+
+class Deribit_Venue(Venue):
+    """
+    Deribit options, both sides quoted from the local books
+    """
+
+    name = "deribit"
+    sides = ("buy", "sell")
+
+    def __init__(self, config):
+        self.agent = Deribit_Agent(config)
+        self.spot = config.get("spot", "ETH")
+        self.instrument_registry = get_instrument_registry(self.spot)
+        self.margin = config.get("margin", 1.25)
+        self.stream_orderbooks = config.get("stream_orderbooks", True)
+
+    def list_instruments(self):
+        """
+        Active calls with both a bid and an ask, from one get_instruments + one book summary call
+        """
+        registry = self.instrument_registry
+        instruments = []
+        for listed in self.agent.run(self.agent.get_listed_options(self.spot)).values():
+            details, summary = listed["instrument"], listed["summary"]
+            if details.get("option_type") != "call" or not details["is_active"]:
+                continue
+            if not (summary.get("bid_price") and summary.get("ask_price")):
+                continue
+            strike = details["strike"]
+            strike = int(strike) if strike == int(strike) else strike
+            instruments.append(registry.register(details["expiration_timestamp"] // 1000, strike, "C"))
+        return instruments
+
+    def track(self, instruments):
+        if self.stream_orderbooks:
+            self.agent.subscribe_orderbooks([instrument.instrument_name for instrument in instruments])
+
+    def get_index_price(self):
+        return self.agent.get_index_price()
+
+    def quote_surface(self, instruments, amounts, index_price):
+        names = [instrument.instrument_name for instrument in instruments]
+        orderbooks = self.agent.run(self.agent.get_batch_orderbooks(names))
+        shape = (len(names), len(amounts))
+        buy = [self.agent._get_pure_quotes(orderbooks[name], amounts, "long") for name in names]
+        sell = [self.agent._get_pure_quotes(orderbooks[name], amounts, "short") for name in names]
+        return Venue_Quotes(
+            np.array(buy, dtype=float).reshape(shape) * index_price,
+            np.array(sell, dtype=float).reshape(shape) * index_price,
+        )
+
+    def balances(self):
+        return {self.spot: self.agent.get_account_summary(self.spot, False)["result"]["available_funds"]}
+
+    def required_funds(self, instrument, amount, side, index_price):
+        if side == "buy":
+            return {self.spot: self.agent.get_pure_quotes(instrument.instrument_name, [amount], "long")[0]}
+        if index_price * self.margin > instrument.strike:
+            required_collateral = (index_price * self.margin - instrument.strike) / index_price
+        else:
+            required_collateral = 0.1
+        return {self.spot: required_collateral * amount}
+
+    def execute(self, instrument, amount, side, index_price):
+        direction = "long" if side == "buy" else "short"
+        response = self.agent.market_order(instrument.instrument_name, amount, direction)
+        if "result" not in response.keys():
+            raise Exception("Trade failed in Deribit please review")
+        return response
+
+    def add_listener(self, callback):
+        self.agent.books.add_listener(callback)
+
+    def close(self):
+        self.agent.session.close()
+
+
+class Lyra_Venue(Venue):
+    """
+    Lyra AMM on Optimism, calls are sold (sETH collateral)
+    NOTE: buy quotes come with the same multicall but buying is not wired to a funded asset yet
+    """
+
+    name = "lyra"
+    sides = ("sell",)
+    network = "optimism"
+    gas_operations = ("openPosition",)
+
+    def __init__(self, config):
+        self.agent = Lyra_Agent(config)
+        self.w3 = self.agent.w3_op
+        self.snapshot = self.agent.snapshot_op
+        self.instruments = []
+        self.surface = None
+
+    def list_instruments(self):
+        registry = self.agent.instrument_registry
+        instruments = []
+        for option_board in self.agent.refresh_boards().values():
+            expiry = option_board["expiry_timestamp"]
+            for strike_id, strike in zip(option_board["strike_ids"], option_board["strikes"]):
+                instruments.append(registry.register(expiry, strike, "C", strike_id=strike_id))
+        self.instruments = instruments
+        return instruments
+
+    def pin(self):
+        return self.snapshot.pin()
+
+    def quote_surface(self, instruments, amounts, index_price):
+        """
+        Both sides of every strike x amount from one multicall, reused while the block is pinned,
+        and the min collateral of the shorts from the collateral cache
+        """
+        strike_ids = [instrument.strike_id for instrument in instruments]
+        surface = self.surface
+        if (
+            surface is None
+            or surface.block_number != self.snapshot.block_number
+            or self.snapshot.block_number is None
+            or surface.strike_ids != strike_ids
+            or surface.amounts != list(amounts)
+        ):
+            surface = self.agent.get_quote_surface(strike_ids, list(amounts), "call")
+            self.surface = surface
+        # cached per spot bucket, so only a bucket crossing reads the chain
+        collateral = self.agent.get_susd_price() * self.agent.get_surface_collaterals(
+            strike_ids, amounts, "call", index_price
+        )
+        # a short whose min collateral reverted cannot be opened
+        sell = np.where(np.isfinite(collateral), surface.sell, np.nan)
+        return Venue_Quotes(surface.buy, sell, collateral)
+
+    def balances(self):
+        return self.agent.get_token_balances(["seth"], "optimism")
+
+    def required_funds(self, instrument, amount, side, index_price):
+        required_collateral = self.agent.get_required_collaterals([instrument], index_price, amount)[0]
+        return {"seth": required_collateral / index_price}
+
+    def execute(self, instrument, amount, side, index_price):
+        if side != "sell":
+            raise Exception("Lyra calls can only be sold")
+        required_collateral = self.required_funds(instrument, amount, side, index_price)["seth"]
+        receipt = self.agent.sell_call(instrument.instrument_name, amount, required_collateral)
+        if receipt["status"] != 1:
+            raise Exception("Trade failed in Lyra please review")
+        return receipt
+
+    def register_gas(self, gas_model, wallet):
+        gas_model.register("openPosition", "optimism", self._sample_open_position, wallet)
+
+    def _sample_open_position(self):
+        """
+        Representative Lyra short call used to estimate openPosition gas
+        """
+        trade_params = {
+            "strikeId": self.instruments[0].strike_id,
+            "positionId": 0,
+            "iterations": self.agent.iterations,
+            "optionType": 2,
+            "amount": 10**18,
+            "setCollateralTo": 10**18,
+            "minTotalCost": 0,
+            "maxTotalCost": MAX_UINT,
+        }
+        return self.agent.optionmarket.functions.openPosition(trade_params)
+
+
+VENUES = {
+    "dopex": Dopex_Venue,
+    "deribit": Deribit_Venue,
+    "lyra": Lyra_Venue,
+}
+
+
+def build_venues(names, config):
+    """
+    Venues of names (keys of VENUES), in that order
+    """
+    unknown = [name for name in names if name not in VENUES]
+    if unknown:
+        raise Exception(f"Unknown venues {unknown}, expected some of {list(VENUES)}")
+    return [VENUES[name](config) for name in names]